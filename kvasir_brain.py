@@ -1,179 +1,947 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import json
 import mailbox
 import os
 import re
-import uuid
+import sqlite3
+import threading
+import time
+import warnings
+from array import array
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
 from email import policy
+from email.header import decode_header, make_header
 from email.message import Message
 from email.parser import BytesParser
 from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from html.parser import HTMLParser
+from itertools import chain, count, islice
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Tuple
-
-from chromadb.utils import embedding_functions
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_community.chat_models import ChatOllama
-from langchain_community.embeddings import OllamaEmbeddings
-from langchain_community.vectorstores import Chroma
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Tuple
+
 from neo4j import GraphDatabase, Driver
 
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+    from langchain_core.embeddings import Embeddings
+
+# chromadb and the langchain packages are imported lazily inside KvasirBrain.__init__:
+# together they cost hundreds of milliseconds, which graph-only callers never need.
+
+try:  # optional: faster JSON for metadata in the SQLite side tables
+    import orjson
+except ImportError:  # pragma: no cover - stdlib fallback
+    orjson = None
+
+try:  # optional: C-level fuzzy matching for entity mentions
+    from rapidfuzz import fuzz, process as fuzz_process
+except ImportError:  # pragma: no cover - exact matching only
+    fuzz = fuzz_process = None
 
-TRIPLE_PROMPT = """You are a precise information extraction system.
-Given a piece of text, extract concise triples that describe facts or relationships.
+
+TRIPLE_PROMPT = """You are a precise information extraction and entity resolution system.
+Given a piece of text and the entities that already exist in a knowledge graph, extract concise triples that describe facts or relationships, and link each subject and object to an existing entity when it refers to the same thing.
 
 Rules:
 - Output only triples, nothing else.
-- Each triple must be on its own line as Subject|Predicate|Object.
+- Each triple must be on its own line as Subject|Subject_canonical|Predicate|Object|Object_canonical.
+- Subject and Object are the names as written in the text; keep them concise but meaningful; avoid pronouns.
+- Subject_canonical and Object_canonical must be copied exactly from "Existing Entities" when the name refers to the same person, project, company, or concept, otherwise NONE.
+- Focus on semantic meaning, not just string similarity: "Dr. Jane" and "Jane Smith" are likely the same person, but "Project Alpha" and "Project Beta" are not.
 - Use short predicate verbs in uppercase (e.g., HAS_SENTIMENT, NEEDS, BLOCKED_BY, OWNS).
 - If there is nothing to extract, return NONE.
-- Keep subjects and objects concise but meaningful; avoid pronouns.
 - Extract at most {max_triples} triples.
 
+Existing Entities:
+{existing_entities}
+
 TEXT:
 {text}
 """
 
-RESOLUTION_PROMPT = """You are an intelligent entity resolution system. Your task is to determine if a "New Entity" is the same as any of the "Existing Entities" from a knowledge graph.
-The entities can be people, projects, companies, or abstract concepts.
-Focus on semantic meaning, not just string similarity. For example, "Dr. Jane" and "Jane Smith" are likely the same person, but "Project Alpha" and "Project Beta" are not.
+BATCH_TRIPLE_PROMPT = """You are a precise information extraction and entity resolution system.
+Given several numbered documents and the entities that already exist in a knowledge graph, extract concise triples from each document that describe facts or relationships, and link each subject and object to an existing entity when it refers to the same thing.
 
-New Entity:
-{new_entity}
+Rules:
+- For every document, first write its header line exactly as given (e.g., ### DOC 1 ###), then its triples.
+- Each triple must be on its own line as Subject|Subject_canonical|Predicate|Object|Object_canonical.
+- Subject and Object are the names as written in the text; keep them concise but meaningful; avoid pronouns.
+- Subject_canonical and Object_canonical must be copied exactly from "Existing Entities" when the name refers to the same person, project, company, or concept, otherwise NONE.
+- Focus on semantic meaning, not just string similarity: "Dr. Jane" and "Jane Smith" are likely the same person, but "Project Alpha" and "Project Beta" are not.
+- Use short predicate verbs in uppercase (e.g., HAS_SENTIMENT, NEEDS, BLOCKED_BY, OWNS).
+- If there is nothing to extract from a document, write NONE under its header.
+- Extract at most {max_triples} triples per document.
 
 Existing Entities:
 {existing_entities}
 
-Question:
-Which of the "Existing Entities" is the best match for the "New Entity"?
-Respond with the single best matching name from the "Existing Entities" list. If there is no clear match, respond with the word NONE.
+DOCUMENTS:
+{documents}
+"""
+
+PROFILE_PROMPT = """
+You are an expert Behavioral Psychologist.
+Analyze the following text snippets associated with {name}.
+
+Determine:
+1. Communication style (direct, passive, verbose, etc.)
+2. Emotional state or sentiments in past interactions.
+3. Potential triggers or concerns.
+
+Text History:
+{context}
+
+Profile Summary:
+"""
+
+SCRIPT_PROMPT = """
+You are Kvasir, a concise and strategic communicator.
+
+Target: {target}
+Target Profile: {profile}
+
+Relevant Facts/Context:
+{facts}
+
+User Goal: {goal}
+
+Task:
+Write a short script for the user to say or email to the target.
+Align tone to the target's profile (if they are direct, be concise; if stressed, be empathetic).
+Use the facts to support the argument.
+
+Script:
 """
 
 
+_RE_WS = re.compile(r"\s+")
+_RE_WORD = re.compile(r"\w+")
+_RE_SUBJ_PREFIX = re.compile(r"^(re:|fwd:)\s*", re.IGNORECASE)
+_RE_MD_CODE = re.compile(r"`{1,3}.*?`{1,3}", re.DOTALL)
+_RE_MD_MARKS = re.compile(r"[_*#>-]{1,3}")
+_RE_BLANK_RUN = re.compile(r"\n{3,}")
+_RE_VERSION_PARTS = re.compile(r"\d+")
+_RE_DOC_HEADER = re.compile(r"^\s*#{2,}\s*DOC\s+(\d+)\s*#*\s*$", re.IGNORECASE | re.MULTILINE)
+
+# One regex pass per line: a signature sign-off ends the body, reply/forward headers are dropped.
+_RE_SIGNATURE = re.compile(r"^(?:--|__|thanks|regards|cheers|best|sincerely),?\s*$", re.IGNORECASE)
+_RE_EMAIL_CRUFT = re.compile(r"^(?:on .+ wrote:|forwarded message.*)$", re.IGNORECASE)
+
+_EMAIL_PARSER = BytesParser(policy=policy.compat32)
+
+# Prompt budgets for briefing LLM calls; Ollama latency grows with prompt length.
+PROFILE_CHUNK_CHARS = 800
+PROFILE_TOTAL_CHARS = 4000
+SCRIPT_FACTS_CHARS = 6000
+
+# get_relations result cache (per process).
+RELATIONS_CACHE_SIZE = 1024
+RELATIONS_CACHE_TTL = 30.0
+
+# Recently merged edges skipped on re-ingest: bounded, and forgotten after the TTL so
+# edges deleted from Neo4j by other clients are merged again.
+EDGE_INDEX_SIZE = 100_000
+EDGE_INDEX_TTL = 300.0
+
+# Parsed mbox batches waiting for a consumer, and batches processed concurrently.
+# Extraction stragglers of one batch then overlap with the next batch's work.
+MBOX_QUEUE_BATCHES = 2
+MBOX_BATCH_WORKERS = 2
+
+# Neo4j driver connections; API ingest writes and /chat graph reads share the pool.
+NEO4J_POOL_SIZE = 50
+
+# Rows per Neo4j write transaction when flushing buffered graph merges.
+MERGE_BATCH_SIZE = 1000
+
+# Texts per backend embedding call; uncached texts are sorted by length first.
+EMBED_BUCKET_SIZE = 16
+
+# Embeddings kept in memory in front of the on-disk embedding cache.
+EMBED_MEMORY_CACHE_SIZE = 8192
+
+# Upper bound on existing entities offered to the extraction prompt for linking.
+CANDIDATE_ENTITY_LIMIT = 50
+
+# Cached entity labels are reloaded after this many seconds to pick up other writers.
+LABEL_CACHE_TTL = 300.0
+
+# Minimum rapidfuzz partial_ratio for a fuzzy label/alias mention.
+FUZZY_MENTION_CUTOFF = 90
+
+# Short documents are extracted together, up to this many per LLM call and this
+# many characters of text, so the prompt preamble is paid once per group.
+EXTRACT_GROUP_SIZE = 8
+EXTRACT_GROUP_CHARS = 6000
+
+# Bytes of each local SQLite file (vectors, keyword index, embedding cache) read
+# through mmap, so reloads fault in only the pages a query touches.
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+
+# Damping constant for reciprocal rank fusion: score = sum(1 / (RRF_K + rank)).
+RRF_K = 60
+
+
+@lru_cache(maxsize=8192)
+def _normalize_label(text: str) -> str:
+    """Collapse whitespace and lowercase; entity names recur constantly, so results are memoized."""
+    return _RE_WS.sub(" ", text).strip().lower()
+
+
+def _match_term(text: str) -> str:
+    """Lowercased form with underscores as spaces, used for mention matching."""
+    return text.lower().replace("_", " ").strip()
+
+
+# Document uids are a per-process random prefix plus a counter: unique across
+# processes and restarts without a urandom read and UUID formatting per document.
+def _reseed_uids() -> None:
+    """New uid prefix and counter; rerun in forked children so workers never share them."""
+    global _UID_PREFIX, _UID_COUNTER
+    _UID_PREFIX = f"{time.time_ns():x}{os.urandom(4).hex()}"
+    _UID_COUNTER = count()
+
+
+_reseed_uids()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reseed_uids)
+
+
+def _new_uid(kind: str) -> str:
+    return f"{kind}-{_UID_PREFIX}-{next(_UID_COUNTER):x}"
+
+
+def _lucene_phrase(text: str) -> str:
+    """Quote text as a Lucene phrase query for db.index.fulltext.queryNodes."""
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _store_slug(name: str) -> str:
+    """Embedder name as a Chroma-collection/file-name safe suffix (alphanumerics, '.', '_', '-')."""
+    return re.sub(r"[^A-Za-z0-9._-]+", "-", name)[:40].strip("-._")
+
+
+def _version_tuple(version: str) -> Tuple[int, ...]:
+    return tuple(int(part) for part in _RE_VERSION_PARTS.findall(version)[:3])
+
+
+def _dumps_json(value: Any) -> str:
+    if orjson is not None:
+        return orjson.dumps(value).decode("utf-8")
+    return json.dumps(value, separators=(",", ":"))
+
+
+def _loads_json(raw: str | bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _connect_sqlite(path: str | Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(str(path), check_same_thread=False)
+    conn.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+    return conn
+
+
+def _parse_email_file(fp) -> Message:
+    """
+    Parse with compat32 (also used as mbox factory). Under the modern policy the
+    parser re-parses Content-Type through the header registry at every step of
+    the multipart walk, which dominated mbox ingest; headers and bodies are
+    decoded on demand instead (`_header_text`, `_extract_email_body`).
+    """
+    return _EMAIL_PARSER.parse(fp)
+
+
+def _header_text(value: Any) -> str:
+    """Decode an RFC 2047 header value (e.g. `=?utf-8?q?...?=`) to plain text."""
+    if not value:
+        return ""
+    try:
+        return str(make_header(decode_header(str(value))))
+    except Exception:
+        return str(value)
+
+
+class _HTMLTextExtractor(HTMLParser):
+    _SKIP_TAGS = {"script", "style", "head"}
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag: str, attrs) -> None:
+        if tag in self._SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in {"br", "p", "div", "li", "tr"}:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in self._SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data: str) -> None:
+        if not self._skip_depth:
+            self.parts.append(data)
+
+
+def _html_to_text(html: str) -> str:
+    extractor = _HTMLTextExtractor()
+    extractor.feed(html)
+    extractor.close()
+    return "".join(extractor.parts)
+
+
+class CachedEmbeddings:
+    """
+    Wraps an embedding backend with a persistent SQLite cache keyed by
+    sha256(model + "\\0" + text), so identical text is only embedded once.
+    Implements the langchain `Embeddings` interface (embed_documents/embed_query).
+    Recently used vectors are also kept in an in-process LRU so hot strings
+    (signatures, repeated queries) skip SQLite too.
+    """
+
+    _LOOKUP_CHUNK = 500
+
+    def __init__(
+        self,
+        inner: Any,
+        model_name: str,
+        cache_path: str | Path,
+        memory_size: int = EMBED_MEMORY_CACHE_SIZE,
+    ) -> None:
+        self.inner = inner
+        self.model_name = model_name
+        self.memory_size = memory_size
+        self._memory: "OrderedDict[bytes, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = _connect_sqlite(cache_path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (sha256 BLOB PRIMARY KEY, vec BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts, self.model_name, self._embed_documents_uncached)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_queries([text])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed several queries with one cache lookup and one backend round for the misses."""
+        # Query embeddings may use a different instruction prefix, so they get their own namespace.
+        return self._embed(texts, f"{self.model_name}:query", self._embed_queries_uncached)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _embed(self, texts: List[str], namespace: str, compute) -> List[List[float]]:
+        keys = [
+            hashlib.sha256(f"{namespace}\0{text}".encode("utf-8")).digest() for text in texts
+        ]
+        found = self._recall(keys)
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        if missing:
+            from_disk = self._lookup(missing)
+            self._remember(from_disk)
+            found.update(from_disk)
+        todo = {key: text for key, text in zip(keys, texts) if key not in found}
+        if todo:
+            fresh = dict(zip(todo.keys(), compute(list(todo.values()))))
+            self._store(fresh)
+            self._remember(fresh)
+            found.update(fresh)
+        return [found[key] for key in keys]
+
+    def _recall(self, keys: List[bytes]) -> Dict[bytes, List[float]]:
+        found: Dict[bytes, List[float]] = {}
+        with self._lock:
+            for key in keys:
+                vec = self._memory.get(key)
+                if vec is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vec
+        return found
+
+    def _remember(self, vectors: Dict[bytes, List[float]]) -> None:
+        if not self.memory_size:
+            return
+        with self._lock:
+            for key, vec in vectors.items():
+                self._memory[key] = vec
+                self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def _embed_documents_uncached(self, texts: List[str]) -> List[List[float]]:
+        # Send similar-length texts together so batched backends pad less; results
+        # are put back in input order.
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors: List[List[float]] = [[] for _ in texts]
+        for start in range(0, len(order), EMBED_BUCKET_SIZE):
+            bucket = order[start : start + EMBED_BUCKET_SIZE]
+            bucket_texts = [texts[i] for i in bucket]
+            if hasattr(self.inner, "embed_documents"):
+                embedded = self.inner.embed_documents(bucket_texts)
+            else:  # chromadb-style embedding function
+                embedded = self.inner(bucket_texts)
+            for i, vec in zip(bucket, embedded):
+                vectors[i] = [float(x) for x in vec]
+        return vectors
+
+    def _embed_queries_uncached(self, texts: List[str]) -> List[List[float]]:
+        if hasattr(self.inner, "embed_queries"):
+            return [[float(x) for x in vec] for vec in self.inner.embed_queries(texts)]
+        if hasattr(self.inner, "embed_query"):
+            return [[float(x) for x in self.inner.embed_query(text)] for text in texts]
+        return self._embed_documents_uncached(texts)
+
+    def _lookup(self, keys: List[bytes]) -> Dict[bytes, List[float]]:
+        found: Dict[bytes, List[float]] = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            for start in range(0, len(unique), self._LOOKUP_CHUNK):
+                chunk = unique[start : start + self._LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT sha256, vec FROM embeddings WHERE sha256 IN ({placeholders})", chunk
+                )
+                for key, blob in rows:
+                    vec = array("f")
+                    vec.frombytes(blob)
+                    found[key] = vec.tolist()
+        return found
+
+    def _store(self, vectors: Dict[bytes, List[float]]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (sha256, vec) VALUES (?, ?)",
+                [(key, array("f", vec).tobytes()) for key, vec in vectors.items()],
+            )
+            self._conn.commit()
+
+
+class OllamaBatchEmbeddings:
+    """
+    Embeds through Ollama's batched `/api/embed` endpoint: one HTTP request per
+    `embed_documents` call instead of one per text. Falls back to the per-text
+    `/api/embeddings` endpoint on servers that predate `/api/embed`. Uses the same
+    `passage: ` / `query: ` instructions as langchain's `OllamaEmbeddings`.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        host: str | None = None,
+        embed_instruction: str = "passage: ",
+        query_instruction: str = "query: ",
+        timeout: float = 60.0,
+    ) -> None:
+        import ollama
+
+        self.model = model
+        self.embed_instruction = embed_instruction
+        self.query_instruction = query_instruction
+        self._client = ollama.Client(host=host, timeout=timeout)
+        self._response_error = ollama.ResponseError
+        self._batch_supported = True
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed([f"{self.embed_instruction}{text}" for text in texts])
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_queries([text])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return self._embed([f"{self.query_instruction}{text}" for text in texts])
+
+    def _embed(self, inputs: List[str]) -> List[List[float]]:
+        if not inputs:
+            return []
+        if self._batch_supported:
+            try:
+                return list(self._client.embed(model=self.model, input=inputs)["embeddings"])
+            except self._response_error as exc:
+                if exc.status_code != 404:
+                    raise
+                self._batch_supported = False
+        return [
+            list(self._client.embeddings(model=self.model, prompt=text)["embedding"])
+            for text in inputs
+        ]
+
+
+class SqliteVecStore:
+    """
+    Small vector store on top of the sqlite-vec extension. Documents live in
+    `docs`; their vectors live in the `vec_chunks` vec0 table under the same rowid,
+    so a KNN lookup is a single SQL query.
+
+    With `quantize_int8`, vectors are stored as int8 with a per-vector symmetric
+    scale and compared by cosine distance (which the scale does not affect), at a
+    quarter of the float32 footprint. An existing table keeps the mode it was
+    created with.
+    """
+
+    def __init__(
+        self, db_path: str | Path, embedding: Embeddings, quantize_int8: bool = False
+    ) -> None:
+        import sqlite_vec  # optional dependency; callers fall back to Chroma on failure
+
+        self._serialize_float32 = sqlite_vec.serialize_float32
+        self.embedding = embedding
+        self._lock = threading.Lock()
+        self._conn = _connect_sqlite(db_path)
+        self._conn.enable_load_extension(True)
+        sqlite_vec.load(self._conn)
+        self._conn.enable_load_extension(False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS docs (
+                id INTEGER PRIMARY KEY,
+                uid TEXT UNIQUE NOT NULL,
+                text TEXT NOT NULL,
+                metadata_json TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+        existing = self._conn.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'vec_chunks'"
+        ).fetchone()
+        self._has_vec_table = existing is not None
+        self.quantize_int8 = "int8[" in existing[0] if existing else quantize_int8
+        self._vec_param = "vec_int8(?)" if self.quantize_int8 else "?"
+
+    def _serialize(self, vector: List[float]) -> bytes:
+        if not self.quantize_int8:
+            return self._serialize_float32(vector)
+        scale = max((abs(x) for x in vector), default=0.0) / 127 or 1.0
+        return array("b", [round(x / scale) for x in vector]).tobytes()
+
+    def add_texts(
+        self,
+        texts: List[str],
+        metadatas: List[Dict[str, object]] | None = None,
+        ids: List[str] | None = None,
+    ) -> List[str]:
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [_new_uid("doc") for _ in texts]
+        vectors = self.embedding.embed_documents(texts)
+        with self._lock, self._conn:
+            if vectors and not self._has_vec_table:
+                # vec0 needs a fixed dimension, so the table is created from the first batch.
+                column = (
+                    f"embedding int8[{len(vectors[0])}] distance_metric=cosine"
+                    if self.quantize_int8
+                    else f"embedding float[{len(vectors[0])}]"
+                )
+                self._conn.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS vec_chunks USING vec0({column})"
+                )
+                self._has_vec_table = True
+            for uid, text, metadata, vector in zip(ids, texts, metadatas, vectors):
+                self._conn.execute(
+                    """
+                    INSERT INTO docs (uid, text, metadata_json) VALUES (?, ?, ?)
+                    ON CONFLICT(uid) DO UPDATE SET text = excluded.text, metadata_json = excluded.metadata_json
+                    """,
+                    (uid, text, _dumps_json(metadata)),
+                )
+                rowid = self._conn.execute("SELECT id FROM docs WHERE uid = ?", (uid,)).fetchone()[0]
+                self._conn.execute("DELETE FROM vec_chunks WHERE rowid = ?", (rowid,))
+                self._conn.execute(
+                    f"INSERT INTO vec_chunks (rowid, embedding) VALUES (?, {self._vec_param})",
+                    (rowid, self._serialize(vector)),
+                )
+        return ids
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4) -> List[Document]:
+        if not self._has_vec_table:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                f"""
+                SELECT d.text, d.metadata_json
+                FROM (
+                    -- `k = ?` rather than LIMIT: vec0 only honours LIMIT on SQLite 3.41+.
+                    SELECT rowid, distance FROM vec_chunks
+                    WHERE embedding MATCH {self._vec_param} AND k = ?
+                ) AS v
+                JOIN docs AS d ON d.id = v.rowid
+                ORDER BY v.distance
+                """,
+                (self._serialize(embedding), k),
+            ).fetchall()
+        from langchain_core.documents import Document
+
+        return [Document(page_content=text, metadata=_loads_json(meta)) for text, meta in rows]
+
+    def similarity_search(self, query: str, k: int = 4) -> List[Document]:
+        return self.similarity_search_by_vector(self.embedding.embed_query(query), k=k)
+
+    def persist(self) -> None:
+        """Writes are committed per batch; nothing to flush."""
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class KeywordIndex:
+    """SQLite FTS5 index over stored documents, used for the keyword half of hybrid recall."""
+
+    def __init__(self, db_path: str | Path) -> None:
+        self._lock = threading.Lock()
+        self._conn = _connect_sqlite(db_path)
+        self._conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(uid UNINDEXED, content, metadata_json UNINDEXED)"
+        )
+        self._conn.commit()
+
+    def add(self, uids: List[str], texts: List[str], metadatas: List[Dict[str, object]]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM docs_fts WHERE uid = ?", [(uid,) for uid in uids])
+            self._conn.executemany(
+                "INSERT INTO docs_fts (uid, content, metadata_json) VALUES (?, ?, ?)",
+                [
+                    (uid, text, _dumps_json(metadata))
+                    for uid, text, metadata in zip(uids, texts, metadatas)
+                ],
+            )
+
+    def search(self, query: str, k: int = 4) -> List[Dict[str, object]]:
+        # Quote every token so user input can never be parsed as FTS5 query syntax.
+        tokens = _RE_WORD.findall(query)
+        if not tokens:
+            return []
+        match = " OR ".join(f'"{token}"' for token in tokens)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT content, metadata_json FROM docs_fts WHERE docs_fts MATCH ? ORDER BY bm25(docs_fts) LIMIT ?",
+                (match, k),
+            ).fetchall()
+        return [{"content": content, "metadata": _loads_json(meta)} for content, meta in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
 class Neo4jGraph:
-    def __init__(self, driver: Driver, resolution_chain, verbose: bool = False):
+    # APOC availability per server URI, so repeated brains in one process probe once.
+    _apoc_by_uri: Dict[str, bool] = {}
+
+    def __init__(self, driver: Driver, verbose: bool = False, uri: str | None = None):
         self.driver = driver
-        self.resolution_chain = resolution_chain
         self.verbose = verbose
+        self.uri = uri
         self.apoc_available = False
+        # (subj_canonical, subj_original, predicate, obj_canonical, obj_original) rows recently
+        # merged by this process -> merge time; re-merging them would be a no-op round-trip.
+        self._edge_index: "OrderedDict[Tuple[str, str, str, str, str], float]" = OrderedDict()
+        # Resolved rows waiting to be merged; written MERGE_BATCH_SIZE at a time or on flush().
+        self._merge_buffer: List[Dict[str, str]] = []
+        self._buffered_edges: set[Tuple[str, str, str, str, str]] = set()
+        self._buffer_lock = threading.Lock()
+        # Serializes flushes: a flush returns only after every earlier in-flight write
+        # (which may carry this caller's rows) has committed or been put back.
+        self._flush_lock = threading.Lock()
+        # label -> lowercased label/alias terms used by candidate_entities; loaded lazily
+        # and extended as rows are buffered, so lookups do not scan the graph.
+        # Term sets are frozen and replaced on update, so snapshots can be read without the lock.
+        self._label_terms: Dict[str, frozenset[str]] | None = None
+        self._label_terms_loaded_at = 0.0
+        # Briefings and chat recall the same entities repeatedly; cache get_relations
+        # results, cleared on every local write and expired after a short TTL so writes
+        # from other processes still show up.
+        self._relations_cache: "OrderedDict[str, Tuple[float, List[Dict[str, str]]]]" = OrderedDict()
+        self._relations_lock = threading.Lock()
         self._ensure_constraints()
         self._check_apoc()
+        self._dedupe_aliases()
 
     def _ensure_constraints(self) -> None:
-        """Ensure uniqueness constraints are set for Entity nodes on the label property."""
+        """
+        Ensure the Entity.label uniqueness constraint, the predicate index, and the
+        lookup indexes used by `get_relations` exist; backfill their properties.
+        """
         with self.driver.session() as session:
-            try:
-                session.run("DROP CONSTRAINT IF EXISTS ON (n:Entity) REQUIRE n.name IS UNIQUE")
-            except Exception:
-                # Already dropped or not present.
-                pass
             session.run("CREATE CONSTRAINT IF NOT EXISTS FOR (n:Entity) REQUIRE n.label IS UNIQUE")
+            # The range indexes only speed queries up (relationship property indexes need
+            # Neo4j 4.3+); without the full-text index, get_relations scans aliases instead.
+            for statement in (
+                "CREATE INDEX IF NOT EXISTS FOR ()-[r:RELATES_TO]-() ON (r.predicate)",
+                "CREATE INDEX entity_norm_label IF NOT EXISTS FOR (n:Entity) ON (n.norm_label)",
+            ):
+                try:
+                    session.run(statement).consume()
+                except Exception as e:
+                    if self.verbose:
+                        print(f"Index not created: {e}")
+            try:
+                session.run(
+                    "CREATE FULLTEXT INDEX entity_fulltext IF NOT EXISTS "
+                    "FOR (n:Entity) ON EACH [n.norm_label, n.alias_text]"
+                ).consume()
+                self.fulltext_available = True
+            except Exception as e:
+                self.fulltext_available = False
+                warnings.warn(
+                    f"Full-text index entity_fulltext not created ({e}); "
+                    "get_relations will scan all entity aliases.",
+                    stacklevel=3,
+                )
+            session.run(
+                f"MATCH (n:Entity) WHERE n.norm_label IS NULL SET {self._lookup_props('n')}"
+            ).consume()
+
+    @staticmethod
+    def _lookup_props(node: str) -> str:
+        """
+        Cypher SET items for the indexed lookup properties: `norm_label` (lowercased,
+        underscores as spaces) and `alias_text` (aliases joined for full-text search).
+        """
+        return (
+            f"{node}.norm_label = toLower(trim(replace({node}.label, '_', ' '))), "
+            f"{node}.alias_text = reduce(s = '', a IN coalesce({node}.aliases, []) | "
+            f"s + ' | ' + replace(a, '_', ' '))"
+        )
 
     def _check_apoc(self) -> None:
-        """Detect whether APOC is available for helper functions."""
+        """Detect whether the APOC functions used by merges are installed (cached per URI once a probe succeeds)."""
+        if self.uri is not None and self.uri in Neo4jGraph._apoc_by_uri:
+            self.apoc_available = Neo4jGraph._apoc_by_uri[self.uri]
+            return
         try:
             with self.driver.session() as session:
-                session.run("RETURN apoc.text.levenshteinDistance('a','b') AS d").single()
-                session.run("RETURN apoc.coll.union([1], [2]) AS u").single()
-            self.apoc_available = True
+                record = session.run(
+                    "SHOW FUNCTIONS YIELD name WHERE name = 'apoc.coll.toSet' "
+                    "RETURN count(*) > 0 AS available"
+                ).single()
+            self.apoc_available = bool(record and record["available"])
         except Exception:
+            # A failed probe may be transient; use the fallback now and probe again next time.
             self.apoc_available = False
+        else:
+            if self.uri is not None:
+                Neo4jGraph._apoc_by_uri[self.uri] = self.apoc_available
+        if not self.apoc_available and self.verbose:
+            print("⚠️  APOC not available; falling back to simpler graph operations.")
+
+    def _dedupe_aliases(self) -> None:
+        """One-off cleanup of alias lists that grew duplicates before merges deduplicated them."""
+        if not self.apoc_available:
+            return
+        try:
+            with self.driver.session() as session:
+                session.execute_write(
+                    lambda tx: tx.run(
+                        """
+                        MATCH (n:Entity)
+                        WHERE n.aliases IS NOT NULL AND size(n.aliases) > size(apoc.coll.toSet(n.aliases))
+                        SET n.aliases = apoc.coll.toSet(n.aliases)
+                        """
+                    ).consume()
+                )
+        except Exception as e:
             if self.verbose:
-                print("⚠️  APOC not available; falling back to simpler graph operations (no fuzzy matching).")
+                print(f"Alias cleanup skipped: {e}")
 
-    def _resolve_entity(self, label: str, session=None, cache: Dict[str, str] | None = None) -> str:
-        """Finds or creates a canonical entity label."""
-        if not label:
-            return ""
+    def candidate_entities(self, text: str, limit: int = CANDIDATE_ENTITY_LIMIT) -> List[str]:
+        """
+        Existing entity labels that the text plausibly mentions (full label, a
+        significant word of it, or an alias). These are offered to the extraction
+        prompt so the LLM can link new mentions in the same call. Matching runs
+        against an in-process copy of the labels; with rapidfuzz installed,
+        near-miss spellings of a label or alias are matched as well.
+        """
+        if not text:
+            return []
+        try:
+            entities = self._entity_terms()
+        except Exception as e:
+            if self.verbose:
+                print(f"Candidate entity lookup failed: {e}")
+            return []
 
-        if cache is not None and label in cache:
-            return cache[label]
+        haystack = _match_term(text)
+        words = set(_RE_WORD.findall(haystack))
+        found: Dict[str, None] = {}
+        for label, terms in entities:
+            if any(len(term) > 2 and term in haystack for term in terms) or any(
+                len(word) > 3 and word in words for word in _match_term(label).split()
+            ):
+                found[label] = None
+                if len(found) >= limit:
+                    return list(found)
+
+        if fuzz_process is not None:
+            choices = {
+                term: label
+                for label, terms in entities
+                if label not in found
+                for term in terms
+                if len(term) > 3
+            }
+            for term, _score, _ in fuzz_process.extract(
+                haystack,
+                list(choices),
+                scorer=fuzz.partial_ratio,
+                score_cutoff=FUZZY_MENTION_CUTOFF,
+                limit=None,
+            ):
+                found[choices[term]] = None
+                if len(found) >= limit:
+                    break
+        return list(found)
+
+    def _entity_terms(self) -> List[Tuple[str, frozenset[str]]]:
+        """Snapshot of label -> match terms, reloaded from Neo4j once per LABEL_CACHE_TTL."""
+        with self._buffer_lock:
+            if (
+                self._label_terms is not None
+                and time.monotonic() - self._label_terms_loaded_at < LABEL_CACHE_TTL
+            ):
+                return list(self._label_terms.items())
 
-        own_session = False
-        if session is None:
-            session = self.driver.session()
-            own_session = True
+        with self.driver.session() as session:
+            rows = session.execute_read(
+                lambda tx: list(
+                    tx.run("MATCH (e:Entity) RETURN e.label AS label, coalesce(e.aliases, []) AS aliases")
+                )
+            )
+        label_terms = {
+            row["label"]: frozenset(
+                _match_term(term) for term in (row["label"], *row["aliases"]) if term
+            )
+            for row in rows
+        }
+
+        with self._buffer_lock:
+            self._label_terms = label_terms
+            self._label_terms_loaded_at = time.monotonic()
+            return list(label_terms.items())
 
+    def _resolve_entities(self, labels: Iterable[str]) -> Dict[str, str]:
+        """
+        Maps each label to the canonical entity that already lists it as an alias,
+        in a single UNWIND round-trip. Labels without an alias hit are omitted.
+        """
+        labels = list(labels)
+        if not labels:
+            return {}
         try:
-            result = session.run(
-                "MATCH (e:Entity) WHERE e.aliases IS NOT NULL AND $label IN e.aliases RETURN e.label",
-                label=label,
-            ).single()
-            if result:
-                resolved = result["e.label"]
-                if cache is not None:
-                    cache[label] = resolved
-                return resolved
-
-            # Step 2: Find candidates for resolution
-            find_candidates_query = """
-            MATCH (e:Entity)
-            WHERE apoc.text.levenshteinDistance(e.label, $label) < 4
-            RETURN e.label AS label
-            LIMIT 5
-            """
-            if not self.apoc_available:
-                find_candidates_query = """
-                MATCH (e:Entity)
-                WHERE toLower(e.label) CONTAINS toLower($label) OR toLower($label) CONTAINS toLower(e.label)
-                RETURN e.label AS label
-                LIMIT 5
-                """
-            candidates = [row["label"] for row in session.run(find_candidates_query, label=label)]
+            with self.driver.session() as session:
+                return session.execute_read(self._resolve_entities_tx, labels)
         except Exception as e:
             if self.verbose:
-                print(f"Entity resolution lookup failed for '{label}': {e}")
-            candidates = []
-        finally:
-            if own_session:
-                session.close()
-
-        if not candidates:
-            if cache is not None:
-                cache[label] = label
-            return label
+                print(f"Entity resolution lookup failed: {e}")
+            return {}
 
-        # Step 3: Ask LLM for resolution
-        try:
-            resolved_name = self.resolution_chain.invoke({
-                "new_entity": label,
-                "existing_entities": "\n".join(f"- {c}" for c in candidates)
-            }).strip()
+    @staticmethod
+    def _resolve_entities_tx(tx, labels: List[str]) -> Dict[str, str]:
+        query = """
+        UNWIND $labels AS label
+        MATCH (e:Entity)
+        WHERE e.aliases IS NOT NULL AND label IN e.aliases
+        RETURN label, head(collect(e.label)) AS canonical
+        """
+        return {row["label"]: row["canonical"] for row in tx.run(query, labels=labels)}
 
-            if self.verbose:
-                print(f"Resolving '{label}': candidates={candidates}, chosen='{resolved_name}'")
+    def update_graph(self, triples: Iterable[Tuple[str, ...]], source_uid: str | None = None) -> None:
+        """
+        Resolves entities and merges triples into the Neo4j graph. Triples are either
+        (subject, predicate, object) or, as produced by extraction,
+        (subject, subject_canonical, predicate, object, object_canonical) where an
+        empty canonical means "not linked by the LLM".
+        """
+        self.update_graph_many([(triples, source_uid)])
 
-            if resolved_name != "NONE" and resolved_name in candidates:
-                if cache is not None:
-                    cache[label] = resolved_name
-                return resolved_name # Return the canonical label of the matched entity
+    async def aupdate_graph(
+        self, triples: Iterable[Tuple[str, ...]], source_uid: str | None = None
+    ) -> None:
+        await self.aupdate_graph_many([(list(triples), source_uid)])
 
-        except Exception as e:
-            if self.verbose:
-                print(f"Entity resolution LLM call failed: {e}")
+    async def aupdate_graph_many(
+        self, docs: List[Tuple[List[Tuple[str, ...]], str | None]]
+    ) -> None:
+        """Run `update_graph_many` in a worker thread so event loops are not blocked."""
+        await asyncio.to_thread(self.update_graph_many, docs)
 
-        if cache is not None:
-            cache[label] = label
-        return label # Default to original label if no match or on error
+    async def aflush(self) -> None:
+        """Run `flush` in a worker thread so event loops are not blocked."""
+        await asyncio.to_thread(self.flush)
 
-    def update_graph(self, triples: Iterable[Tuple[str, str, str]], source_uid: str | None = None) -> None:
+    def update_graph_many(
+        self, docs: Iterable[Tuple[Iterable[Tuple[str, ...]], str | None]]
+    ) -> None:
         """
-        Resolves entities and merges triples into the Neo4j graph.
+        Like `update_graph`, but for the triples of several documents at once.
+        Resolved rows are buffered across calls and merged MERGE_BATCH_SIZE at a
+        time; call `flush()` to write the remainder.
         """
-        triples_list = list(triples)
-        if not triples_list:
+        # Drop malformed and repeated triples up front; the first document keeps source_uid,
+        # matching the ON CREATE semantics of the merge.
+        rows: Dict[Tuple[str, str, str, str, str], str | None] = {}
+        for triples, source_uid in docs:
+            for triple in triples:
+                if len(triple) == 5:
+                    subj, subj_linked, pred, obj, obj_linked = triple
+                else:
+                    (subj, pred, obj), subj_linked, obj_linked = triple, "", ""
+                if subj and pred and obj:
+                    rows.setdefault((subj, subj_linked, pred, obj, obj_linked), source_uid)
+        if not rows:
             return
 
-        resolution_cache: Dict[str, str] = {}
-        batch: List[Dict[str, str]] = []
+        # Only mentions the LLM did not link need the alias lookup.
+        unlinked = dict.fromkeys(
+            label
+            for subj, subj_linked, _, obj, obj_linked in rows
+            for label, linked in ((subj, subj_linked), (obj, obj_linked))
+            if not linked
+        )
+        resolved = self._resolve_entities(unlinked)
+
+        rows_resolved = [
+            (
+                (
+                    subj_linked or resolved.get(subj_original, subj_original),
+                    subj_original,
+                    pred,
+                    obj_linked or resolved.get(obj_original, obj_original),
+                    obj_original,
+                ),
+                source_uid,
+            )
+            for (subj_original, subj_linked, pred, obj_original, obj_linked), source_uid in rows.items()
+        ]
 
-        with self.driver.session() as session:
-            for subj_original, pred, obj_original in triples_list:
-                subj_canonical = self._resolve_entity(subj_original, session=session, cache=resolution_cache)
-                obj_canonical = self._resolve_entity(obj_original, session=session, cache=resolution_cache)
-                batch.append(
+        with self._buffer_lock:
+            now = time.monotonic()
+            for edge_key, source_uid in rows_resolved:
+                merged_at = self._edge_index.get(edge_key)
+                if (
+                    merged_at is not None and now - merged_at < EDGE_INDEX_TTL
+                ) or edge_key in self._buffered_edges:
+                    continue
+                self._buffered_edges.add(edge_key)
+                subj_canonical, subj_original, pred, obj_canonical, obj_original = edge_key
+                if self._label_terms is not None:
+                    for canonical, original in ((subj_canonical, subj_original), (obj_canonical, obj_original)):
+                        self._label_terms[canonical] = self._label_terms.get(
+                            canonical, frozenset()
+                        ) | {_match_term(canonical), _match_term(original)}
+                self._merge_buffer.append(
                     {
                         "subj_canonical": subj_canonical,
                         "subj_original": subj_original,
@@ -183,35 +951,69 @@ class Neo4jGraph:
                         "source_uid": source_uid,
                     }
                 )
+            full = len(self._merge_buffer) >= MERGE_BATCH_SIZE
 
-            if not batch:
-                return
-
-            alias_union = (
-                "apoc.coll.union(coalesce({alias}, []), [t.{original}])"
-                if self.apoc_available
-                else "coalesce({alias}, []) + [t.{original}]"
-            )
-            subj_alias_expr = alias_union.format(alias="subj.aliases", original="subj_original")
-            obj_alias_expr = alias_union.format(alias="obj.aliases", original="obj_original")
+        if full:
+            self.flush()
 
-            merge_query = f"""
-            UNWIND $batch AS t
-            MERGE (subj:Entity {{label: t.subj_canonical}})
-            ON CREATE SET subj.aliases = [t.subj_original]
-            ON MATCH SET subj.aliases = {subj_alias_expr}
-
-            MERGE (obj:Entity {{label: t.obj_canonical}})
-            ON CREATE SET obj.aliases = [t.obj_original]
-            ON MATCH SET obj.aliases = {obj_alias_expr}
-
-            MERGE (subj)-[rel:RELATES_TO {{predicate: t.predicate}}]->(obj)
-            ON CREATE SET rel.source_uid = t.source_uid
-            """
-            session.run(merge_query, batch=batch)
+    def flush(self) -> None:
+        """
+        Merge all buffered rows, MERGE_BATCH_SIZE per write transaction. If a write
+        fails, the rows go back into the buffer for the next flush and the error is raised.
+        """
+        with self._flush_lock:
+            with self._buffer_lock:
+                if not self._merge_buffer:
+                    return
+                pending, self._merge_buffer = self._merge_buffer, []
+                edges, self._buffered_edges = self._buffered_edges, set()
+            try:
+                self._write_merge_rows(pending)
+            except Exception:
+                with self._buffer_lock:
+                    self._merge_buffer[:0] = pending
+                    self._buffered_edges |= edges
+                raise
+            with self._buffer_lock:
+                merged_at = time.monotonic()
+                for edge_key in edges:
+                    self._edge_index[edge_key] = merged_at
+                    self._edge_index.move_to_end(edge_key)
+                while len(self._edge_index) > EDGE_INDEX_SIZE:
+                    self._edge_index.popitem(last=False)
+        self._invalidate_relations()
 
         if self.verbose:
-            print(f"Updated graph with {len(batch)} triples (with entity resolution).")
+            print(f"Updated graph with {len(pending)} triples (with entity resolution).")
+
+    def _write_merge_rows(self, pending: List[Dict[str, str]]) -> None:
+        alias_union = (
+            "apoc.coll.toSet(coalesce({alias}, []) + [t.{original}])"
+            if self.apoc_available
+            else "coalesce({alias}, []) + [x IN [t.{original}] WHERE NOT x IN coalesce({alias}, [])]"
+        )
+        subj_alias_expr = alias_union.format(alias="subj.aliases", original="subj_original")
+        obj_alias_expr = alias_union.format(alias="obj.aliases", original="obj_original")
+
+        merge_query = f"""
+        UNWIND $batch AS t
+        MERGE (subj:Entity {{label: t.subj_canonical}})
+        ON CREATE SET subj.aliases = [t.subj_original]
+        ON MATCH SET subj.aliases = {subj_alias_expr}
+        SET {self._lookup_props("subj")}
+
+        MERGE (obj:Entity {{label: t.obj_canonical}})
+        ON CREATE SET obj.aliases = [t.obj_original]
+        ON MATCH SET obj.aliases = {obj_alias_expr}
+        SET {self._lookup_props("obj")}
+
+        MERGE (subj)-[rel:RELATES_TO {{predicate: t.predicate}}]->(obj)
+        ON CREATE SET rel.source_uid = t.source_uid
+        """
+        with self.driver.session() as session:
+            for start in range(0, len(pending), MERGE_BATCH_SIZE):
+                batch = pending[start : start + MERGE_BATCH_SIZE]
+                session.execute_write(lambda tx: tx.run(merge_query, batch=batch).consume())
 
     def get_relations(self, entity: str) -> List[Dict[str, str]]:
         """
@@ -222,52 +1024,93 @@ class Neo4jGraph:
         if not entity:
             return []
 
-        normalized = entity.strip()
-        underscored = normalized.replace(" ", "_")
-        spaced = normalized.replace("_", " ")
+        # Matching below is case-insensitive, so the lowercased form is safe to use.
+        normalized = _normalize_label(entity)
+        key = _match_term(normalized)
 
-        query = """
-        MATCH (n:Entity)
-        WHERE
-          toLower(n.label) = toLower($normalized) OR
-          toLower(n.label) = toLower($underscored) OR
-          toLower(replace(n.label, '_', ' ')) = toLower($spaced) OR
-          toLower($normalized) IN [x IN coalesce(n.aliases, []) | toLower(x)] OR
-          toLower($underscored) IN [x IN coalesce(n.aliases, []) | toLower(x)] OR
-          toLower($spaced) IN [x IN coalesce(n.aliases, []) | toLower(x)]
-        OPTIONAL MATCH (n)-[r]->(obj)
-        OPTIONAL MATCH (subj)-[r2]->(n)
-        WITH n,
-             COLLECT(DISTINCT {subject: n.label, predicate: r.predicate, object: obj.label}) AS outgoing,
-             COLLECT(DISTINCT {subject: subj.label, predicate: r2.predicate, object: n.label}) AS incoming
-        RETURN outgoing, incoming
+        # Labels are matched through the norm_label index; aliases through the
+        # full-text index when it exists, with the exact alias check applied to its hits.
+        alias_nodes = (
+            "CALL db.index.fulltext.queryNodes('entity_fulltext', $phrase) YIELD node AS n\n          WITH n"
+            if self.fulltext_available
+            else "MATCH (n:Entity)"
+        )
+        query = f"""
+        CALL {{
+          MATCH (n:Entity {{norm_label: $key}})
+          RETURN n
+          UNION
+          {alias_nodes}
+          WHERE $key IN [x IN coalesce(n.aliases, []) | toLower(trim(replace(x, '_', ' ')))]
+          RETURN n
+        }}
+        WITH n LIMIT 1
+        OPTIONAL MATCH (n)-[r]-(other)
+        RETURN COLLECT(DISTINCT CASE
+          WHEN startNode(r) = n THEN {{subject: n.label, predicate: r.predicate, object: other.label}}
+          ELSE {{subject: other.label, predicate: r.predicate, object: n.label}}
+        END) AS relations
         """
-        with self.driver.session() as session:
-            result = session.run(
-                query,
-                normalized=normalized,
-                underscored=underscored,
-                spaced=spaced,
-            ).single()
-            if not result:
-                return []
+        # Reads must see rows still sitting in the merge buffer.
+        self.flush()
+        cached = self._cached_relations(normalized)
+        if cached is not None:
+            return cached
 
+        with self.driver.session() as session:
+            result = session.execute_read(
+                lambda tx: tx.run(query, key=key, phrase=_lucene_phrase(key)).single()
+            )
+            # Without a neighbor, OPTIONAL MATCH yields one map with null subject/predicate.
             relations = [
                 rel
-                for rel in result["outgoing"]
+                for rel in result["relations"]
                 if rel["subject"] and rel["predicate"] and rel["object"]
-            ]
-            relations.extend(
-                [
-                    rel
-                    for rel in result["incoming"]
-                    if rel["subject"] and rel["predicate"] and rel["object"]
-                ]
+            ] if result else []
+
+        self._remember_relations(normalized, relations)
+        return list(relations)
+
+    def all_relations(self, limit: int | None = None) -> List[Dict[str, str]]:
+        """All subject/predicate/object relations, in one read transaction."""
+        self.flush()
+        query = """
+        MATCH (subj:Entity)-[r:RELATES_TO]->(obj:Entity)
+        RETURN subj.label AS subject, r.predicate AS predicate, obj.label AS object
+        """
+        if limit is not None:
+            query += " LIMIT $limit"
+        with self.driver.session() as session:
+            return session.execute_read(
+                lambda tx: [record.data() for record in tx.run(query, limit=limit)]
             )
-            return relations
+
+    def _cached_relations(self, key: str) -> List[Dict[str, str]] | None:
+        with self._relations_lock:
+            entry = self._relations_cache.get(key)
+            if entry is None:
+                return None
+            stored_at, relations = entry
+            if time.monotonic() - stored_at > RELATIONS_CACHE_TTL:
+                del self._relations_cache[key]
+                return None
+            self._relations_cache.move_to_end(key)
+            return list(relations)
+
+    def _remember_relations(self, key: str, relations: List[Dict[str, str]]) -> None:
+        with self._relations_lock:
+            self._relations_cache[key] = (time.monotonic(), relations)
+            self._relations_cache.move_to_end(key)
+            while len(self._relations_cache) > RELATIONS_CACHE_SIZE:
+                self._relations_cache.popitem(last=False)
+
+    def _invalidate_relations(self) -> None:
+        with self._relations_lock:
+            self._relations_cache.clear()
 
     def close(self) -> None:
         if self.driver:
+            self.flush()
             self.driver.close()
 
 
@@ -279,33 +1122,106 @@ class KvasirBrain:
         embedding_model: str = "nomic-embed-text",
         max_triples: int = 10,
         use_chroma_default_embeddings: bool = False,
+        ingest_batch_size: int = 64,
+        max_concurrency: int = 8,
+        extraction_workers: int | None = None,
+        backend: str = "chroma",
+        quantize_int8: bool = False,
         verbose: bool = False,
     ) -> None:
+        if backend not in {"chroma", "sqlite-vec"}:
+            raise ValueError(f"Unsupported vector backend: {backend}")
+        from chromadb.utils import embedding_functions
+        from langchain_community.chat_models import ChatOllama
+        from langchain_community.vectorstores import Chroma
+        from langchain_core.output_parsers import StrOutputParser
+        from langchain_core.prompts import ChatPromptTemplate
+
         self.verbose = verbose
         self.memory_dir = Path(memory_dir)
         self.memory_dir.mkdir(parents=True, exist_ok=True)
         self.chroma_path = self.memory_dir / "chroma"
         self.max_triples = max_triples
+        self.ingest_batch_size = max(1, ingest_batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self._pending_persist = False
+
+        import chromadb
 
         if use_chroma_default_embeddings:
-            self.embedding = embedding_functions.DefaultEmbeddingFunction()
-            embedding_fn = self.embedding
+            base_embedding = embedding_functions.DefaultEmbeddingFunction()
+            embed_name = "chroma-default"
         else:
-            self.embedding = OllamaEmbeddings(model=embedding_model)
-            embedding_fn = self.embedding
+            base_embedding = OllamaBatchEmbeddings(model=embedding_model)
+            # /api/embed returns normalized vectors; keep them apart from cached
+            # vectors produced by the older per-text endpoint.
+            embed_name = f"{embedding_model}@embed"
+        self.embedding = CachedEmbeddings(
+            base_embedding, embed_name, self.memory_dir / "embed_cache.sqlite"
+        )
+        embedding_fn = self.embedding
 
         if self.verbose:
-            embed_name = (
-                "chroma-default" if use_chroma_default_embeddings else embedding_model
-            )
             print(
                 f"🧠 KvasirBrain init | memory_dir={self.memory_dir} llm={llm_model} embeddings={embed_name}"
             )
 
-        self.vector_store = Chroma(
-            collection_name="kvasir_text",
-            embedding_function=embedding_fn,
-            persist_directory=str(self.chroma_path),
+        # Vectors from different embedders live on different scales (/api/embed normalizes,
+        # the old per-text endpoint did not), so each embedder gets its own collection and
+        # vector file; Chroma's default embedder keeps the original names.
+        store_suffix = "" if use_chroma_default_embeddings else f"-{_store_slug(embed_name)}"
+        self.collection_name = f"kvasir_text{store_suffix}"
+
+        self.backend = backend
+        self.vector_store: Any = None
+        if backend == "sqlite-vec":
+            vectors_path = self.memory_dir / f"vectors{store_suffix}.sqlite"
+            legacy_path = self.memory_dir / "vectors.sqlite"
+            if store_suffix and legacy_path.exists() and not vectors_path.exists():
+                warnings.warn(
+                    f"{legacy_path} holds vectors from an older embedding endpoint and is no "
+                    f"longer queried; re-ingest your sources to populate {vectors_path.name}.",
+                    stacklevel=2,
+                )
+            try:
+                self.vector_store = SqliteVecStore(
+                    vectors_path, self.embedding, quantize_int8=quantize_int8
+                )
+            except (ImportError, AttributeError, sqlite3.Error) as exc:
+                if self.verbose:
+                    print(f"⚠️  sqlite-vec unavailable ({exc}); falling back to Chroma.")
+                self.backend = "chroma"
+        if self.vector_store is None:
+            self.vector_store = Chroma(
+                collection_name=self.collection_name,
+                embedding_function=embedding_fn,
+                persist_directory=str(self.chroma_path),
+            )
+            if store_suffix:
+                self._warn_legacy_collection()
+        # chromadb >= 0.4 persists on every write (PersistentClient); calling persist()
+        # there is deprecated and only forces an extra checkpoint. sqlite-vec commits per batch.
+        self._needs_persist = (
+            self.backend == "chroma"
+            and _version_tuple(chromadb.__version__) < (0, 4)
+            and hasattr(self.vector_store, "persist")
+        )
+
+        try:
+            self.keyword_index: KeywordIndex | None = KeywordIndex(self.memory_dir / "keyword.sqlite")
+        except sqlite3.Error as exc:
+            # SQLite builds without FTS5 still get plain vector recall.
+            if self.verbose:
+                print(f"⚠️  FTS5 unavailable ({exc}); hybrid recall disabled.")
+            self.keyword_index = None
+        # Keyword half of hybrid recall only; the FTS5 index serializes queries on its
+        # own lock, so one worker adds no queueing. Vector search runs on the caller's thread.
+        self._recall_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="kvasir-recall")
+        # Triple extraction is network-bound on Ollama, so the sync path runs it on worker
+        # threads while the calling thread embeds and stays the only writer to Chroma/Neo4j.
+        self._extract_pool = ThreadPoolExecutor(
+            max_workers=max(1, extraction_workers or self.max_concurrency),
+            thread_name_prefix="kvasir-extract",
         )
 
         try:
@@ -317,19 +1233,63 @@ class KvasirBrain:
 
         triple_prompt = ChatPromptTemplate.from_template(TRIPLE_PROMPT)
         self.triple_chain = triple_prompt | self.llm | StrOutputParser()
+        batch_triple_prompt = ChatPromptTemplate.from_template(BATCH_TRIPLE_PROMPT)
+        self._batch_triple_chain = batch_triple_prompt | self.llm | StrOutputParser()
+
+        self._profile_chain = (
+            ChatPromptTemplate.from_template(PROFILE_PROMPT) | self.llm | StrOutputParser()
+        )
+        self._script_chain = (
+            ChatPromptTemplate.from_template(SCRIPT_PROMPT) | self.llm | StrOutputParser()
+        )
+
+        self.graph = self._connect_graph()
 
-        resolution_prompt = ChatPromptTemplate.from_template(RESOLUTION_PROMPT)
-        self.resolution_chain = resolution_prompt | self.llm | StrOutputParser()
+    def _warn_legacy_collection(self) -> None:
+        """Warn when the pre-/api/embed `kvasir_text` collection still holds documents."""
+        try:
+            client = self.vector_store._client
+            legacy_count = client.get_collection("kvasir_text").count()
+            current_count = self.vector_store._collection.count()
+        except Exception:  # collection absent, or a Chroma version without these attributes
+            return
+        if legacy_count and not current_count:
+            warnings.warn(
+                f"Chroma collection 'kvasir_text' in {self.chroma_path} holds {legacy_count} "
+                "documents embedded with an older endpoint and is no longer queried; "
+                f"re-ingest your sources to populate '{self.collection_name}'.",
+                stacklevel=3,
+            )
 
+    @classmethod
+    def from_graph_only(
+        cls, memory_dir: str | Path = "kvasir_memory", verbose: bool = False
+    ) -> "KvasirBrain":
+        """
+        Build a brain that only talks to Neo4j (`recall_structure`), without importing
+        or starting the LLM, embedding, or vector-store stacks. Useful for short-lived
+        CLIs that just query the existing graph.
+        """
+        brain = cls.__new__(cls)
+        brain.verbose = verbose
+        brain.memory_dir = Path(memory_dir)
+        brain._pending_persist = False
+        brain.graph = brain._connect_graph()
+        return brain
+
+    def _connect_graph(self) -> Neo4jGraph:
         try:
             uri = os.environ["NEO4J_URI"]
             user = os.environ["NEO4J_USER"]
             password = os.environ["NEO4J_PASSWORD"]
-            driver = GraphDatabase.driver(uri, auth=(user, password))
+            driver = GraphDatabase.driver(
+                uri, auth=(user, password), max_connection_pool_size=NEO4J_POOL_SIZE
+            )
             driver.verify_connectivity()
-            self.graph = Neo4jGraph(driver, resolution_chain=self.resolution_chain, verbose=self.verbose)
+            graph = Neo4jGraph(driver, verbose=self.verbose, uri=uri)
             if self.verbose:
                 print(f"🔗 Connected to Neo4j at {uri}")
+            return graph
         except (KeyError, Exception) as exc:
             raise RuntimeError(
                 "Neo4j connection failed. Ensure NEO4J_URI, NEO4J_USER, and NEO4J_PASSWORD are set."
@@ -339,81 +1299,271 @@ class KvasirBrain:
         self.close()
 
     def close(self) -> None:
+        if getattr(self, "vector_store", None) is not None:
+            self.flush()
+        # Closing the graph also flushes its merge buffer.
         if hasattr(self, "graph") and self.graph:
             self.graph.close()
+        if hasattr(getattr(self, "vector_store", None), "close"):
+            self.vector_store.close()
+        if getattr(self, "keyword_index", None) is not None:
+            self.keyword_index.close()
+        if hasattr(self, "_recall_pool"):
+            self._recall_pool.shutdown(wait=False)
+        if hasattr(self, "_extract_pool"):
+            self._extract_pool.shutdown(wait=False)
+        if hasattr(self, "embedding"):
+            self.embedding.close()
+
+    def flush(self) -> None:
+        """Persist vector-store writes and graph merges buffered by `ingest_text` and friends."""
+        if self._pending_persist:
+            self.vector_store.persist()
+            self._pending_persist = False
+        if getattr(self, "graph", None):
+            self.graph.flush()
 
     def ingest_file(self, filepath: str | Path) -> None:
         path = Path(filepath)
         if not path.exists():
             raise FileNotFoundError(f"Missing file: {filepath}")
 
-        suffix = path.suffix.lower()
-        if suffix == ".eml":
-            self._ingest_eml(path)
-        elif suffix == ".mbox":
+        if path.suffix.lower() == ".mbox":
             self._ingest_mbox(path)
-        elif suffix in {".txt", ".md"}:
-            self._ingest_note(path)
         else:
-            raise ValueError(f"Unsupported file type: {suffix}")
+            self._ingest_prepared([self._prepare_file(path)])
+        self.flush()
+
+    async def aingest_file(self, filepath: str | Path) -> None:
+        """Async variant of `ingest_file`; mbox messages are processed concurrently."""
+        path = Path(filepath)
+        if not path.exists():
+            raise FileNotFoundError(f"Missing file: {filepath}")
+
+        if path.suffix.lower() == ".mbox":
+            await self._aingest_mbox(path)
+        else:
+            await self._aingest_prepared([await asyncio.to_thread(self._prepare_file, path)])
+        await asyncio.to_thread(self.flush)
+
+    async def aingest_files(self, filepaths: Iterable[str | Path]) -> None:
+        """
+        Batch variant of `aingest_file`: `.eml`/`.txt`/`.md` files are parsed
+        concurrently in worker threads and ingested as one batch (one `add_texts`,
+        shared extraction calls, one graph update); mbox files are streamed as usual.
+        """
+        paths = [Path(filepath) for filepath in filepaths]
+        for path in paths:
+            if not path.exists():
+                raise FileNotFoundError(f"Missing file: {path}")
+
+        mboxes = [path for path in paths if path.suffix.lower() == ".mbox"]
+        docs = await asyncio.gather(
+            *(
+                asyncio.to_thread(self._prepare_file, path)
+                for path in paths
+                if path.suffix.lower() != ".mbox"
+            )
+        )
+        if docs:
+            await self._aingest_prepared(list(docs))
+        for path in mboxes:
+            await self._aingest_mbox(path)
+        await asyncio.to_thread(self.flush)
 
     def ingest_text(self, content: str, metadata: Dict[str, Any]) -> str:
         """
         Ingests arbitrary text with provided metadata into vector and graph stores.
-        Returns the UID assigned to the document.
+        Returns the UID assigned to the document. The vector store is persisted
+        and graph merges are written lazily; call `flush()` (or `close()`) once a
+        series of ingests is done.
         """
         metadata = dict(metadata)
         metadata.setdefault("type", "text")
         metadata.setdefault("ingested_at", datetime.utcnow().isoformat())
-        doc_uid = self._store_text(content, metadata)
-        triples = self._extract_triples(content)
-        if triples:
-            self.graph.update_graph(triples, source_uid=doc_uid)
-        return doc_uid
+        return self._ingest_prepared([(content, metadata)])[0]
+
+    async def aingest_text(
+        self, content: str, metadata: Dict[str, Any], *, flush_graph: bool = False
+    ) -> str:
+        """
+        Async variant of `ingest_text`: embedding and triple extraction overlap.
+        With `flush_graph=True` the document's triples are written to Neo4j before returning.
+        """
+        metadata = dict(metadata)
+        metadata.setdefault("type", "text")
+        metadata.setdefault("ingested_at", datetime.utcnow().isoformat())
+        return (await self._aingest_prepared([(content, metadata)], flush_graph=flush_graph))[0]
+
+    def ingest_texts(
+        self, contents: List[str], metadatas: List[Dict[str, Any]]
+    ) -> List[str]:
+        """
+        Batch variant of `ingest_text`: all documents are embedded and stored with
+        one `add_texts` call and their triples merged in one graph update.
+        Returns the UIDs in input order.
+        """
+        return self._ingest_prepared(self._text_docs(contents, metadatas))
+
+    async def aingest_texts(
+        self,
+        contents: List[str],
+        metadatas: List[Dict[str, Any]],
+        *,
+        flush_graph: bool = False,
+    ) -> List[str]:
+        """
+        Async variant of `ingest_texts`; short documents share extraction calls.
+        With `flush_graph=True` the batch's triples are written to Neo4j before returning.
+        """
+        return await self._aingest_prepared(
+            self._text_docs(contents, metadatas), flush_graph=flush_graph
+        )
+
+    @staticmethod
+    def _text_docs(
+        contents: List[str], metadatas: List[Dict[str, Any]]
+    ) -> List[Tuple[str, Dict[str, object]]]:
+        if len(contents) != len(metadatas):
+            raise ValueError("contents and metadatas must have the same length")
+        ingested_at = datetime.utcnow().isoformat()
+        docs = []
+        for content, metadata in zip(contents, metadatas):
+            metadata = dict(metadata)
+            metadata.setdefault("type", "text")
+            metadata.setdefault("ingested_at", ingested_at)
+            docs.append((content, metadata))
+        return docs
 
     # Backwards-compatible alias mirroring the user's original API.
     ingest_data = ingest_text
 
-    def recall_vectors(self, query: str, k: int = 4) -> List[Dict[str, object]]:
-        docs = self.vector_store.similarity_search(query, k=k)
+    def recall_vectors(
+        self,
+        query: str,
+        k: int = 4,
+        hybrid: bool = True,
+        *,
+        embedding: List[float] | None = None,
+    ) -> List[Dict[str, object]]:
+        """
+        Semantic search over stored text. With `hybrid`, BM25 keyword hits are
+        fetched in parallel and merged with the vector hits by reciprocal rank fusion,
+        so exact names and IDs are not lost to embedding similarity. Pass a
+        precomputed query `embedding` (see `embed_queries`) to skip embedding here.
+        """
+        if not hybrid or self.keyword_index is None:
+            return self._vector_hits(query, k, embedding)
+
+        keyword_future = self._recall_pool.submit(self.keyword_index.search, query, k)
+        vector_hits = self._vector_hits(query, k, embedding)
+        return self._fuse_ranked([vector_hits, keyword_future.result()], k)
+
+    def _vector_hits(
+        self, query: str, k: int, embedding: List[float] | None = None
+    ) -> List[Dict[str, object]]:
+        if embedding is None:
+            embedding = self.embedding.embed_query(query)
+        docs = self.vector_store.similarity_search_by_vector(embedding, k=k)
         return [
             {"content": doc.page_content, "metadata": doc.metadata} for doc in docs
         ]
 
+    @staticmethod
+    def _fuse_ranked(
+        ranked_lists: List[List[Dict[str, object]]], k: int
+    ) -> List[Dict[str, object]]:
+        scores: Dict[str, float] = {}
+        hits: Dict[str, Dict[str, object]] = {}
+        for ranked in ranked_lists:
+            for rank, hit in enumerate(ranked, start=1):
+                key = str((hit.get("metadata") or {}).get("uid") or hit["content"])
+                scores[key] = scores.get(key, 0.0) + 1.0 / (RRF_K + rank)
+                hits.setdefault(key, hit)
+        best = sorted(scores, key=scores.__getitem__, reverse=True)[:k]
+        return [hits[key] for key in best]
+
     def recall_structure(self, entity: str) -> List[Dict[str, str]]:
         return self.graph.get_relations(entity)
 
+    def dump_graph(self, limit: int | None = None) -> List[Dict[str, str]]:
+        """Every relation in the graph (or the first `limit`), fetched with one query."""
+        return self.graph.all_relations(limit)
+
     def generate_briefing(
         self, topic: str, target_person: str, goal: str, n_results: int = 3
     ) -> Dict[str, str]:
         """
         Phase 2 helper: assemble facts, profile, and a suggested script.
+        Synchronous wrapper around `agenerate_briefing`; inside a running event
+        loop it runs on a private loop in a worker thread.
         """
-        vector_hits = self.recall_vectors(topic, k=n_results)
+        coro = self.agenerate_briefing(topic, target_person, goal, n_results=n_results)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coro)
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="kvasir-briefing") as pool:
+            return pool.submit(asyncio.run, coro).result()
+
+    async def agenerate_briefing(
+        self, topic: str, target_person: str, goal: str, n_results: int = 3
+    ) -> Dict[str, str]:
+        """
+        Async variant of `generate_briefing`: both query embeddings are computed in
+        one call, then the two vector recalls and two graph recalls run concurrently.
+        The profile LLM call starts as soon as the person's documents arrive, so it
+        overlaps with the remaining recalls; only the script waits for everything.
+        """
+        topic_embedding, person_embedding = await asyncio.to_thread(
+            self.embedding.embed_queries, [topic, target_person]
+        )
+
+        async def analyze_profile() -> str:
+            profile_docs = await asyncio.to_thread(
+                self.recall_vectors, target_person, max(5, n_results), embedding=person_embedding
+            )
+            return await self._aanalyze_profile(
+                target_person, [doc["content"] for doc in profile_docs]
+            )
+
+        profile_task = asyncio.create_task(analyze_profile())
+        try:
+            vector_hits, person_relations, topic_relations = await asyncio.gather(
+                asyncio.to_thread(self.recall_vectors, topic, n_results, embedding=topic_embedding),
+                asyncio.to_thread(self.recall_structure, target_person),
+                asyncio.to_thread(self.recall_structure, topic),
+            )
+        except BaseException:
+            # Don't leave the profile LLM call running unobserved after a failed recall.
+            profile_task.cancel()
+            raise
+
         vector_text = "\n---\n".join(doc["content"] for doc in vector_hits) or "No matching documents."
 
-        graph_relations = self.recall_structure(target_person) + self.recall_structure(
-            topic
+        graph_lines = dict.fromkeys(
+            f"{rel['subject']} -[{rel['predicate']}]-> {rel['object']}"
+            for rel in chain(person_relations, topic_relations)
         )
-        seen: set[str] = set()
-        graph_lines: List[str] = []
-        for rel in graph_relations:
-            line = f"{rel['subject']} -[{rel['predicate']}]-> {rel['object']}"
-            if line not in seen:
-                seen.add(line)
-                graph_lines.append(line)
         graph_text = "\n".join(graph_lines) or "No structured relations found."
 
-        profile_docs = self.recall_vectors(target_person, k=max(5, n_results))
-        profile_context = [doc["content"] for doc in profile_docs]
-        profile = self._analyze_profile(target_person, profile_context)
-
         fact_sheet = f"Context from Files:\n{vector_text}\n\nStructured Connections:\n{graph_text}"
-        script = self._draft_script(target_person, profile, fact_sheet, goal)
+        profile = await profile_task
+        script = await self._adraft_script(target_person, profile, fact_sheet, goal)
 
         return {"facts": fact_sheet, "profile": profile, "script": script}
 
-    def _ingest_note(self, path: Path) -> None:
+    def _prepare_file(self, path: Path) -> Tuple[str, Dict[str, object]]:
+        suffix = path.suffix.lower()
+        if suffix == ".eml":
+            with path.open("rb") as fp:
+                message = _parse_email_file(fp)
+            return self._prepare_email_message(message, path)
+        if suffix in {".txt", ".md"}:
+            return self._prepare_note(path)
+        raise ValueError(f"Unsupported file type: {suffix}")
+
+    def _prepare_note(self, path: Path) -> Tuple[str, Dict[str, object]]:
         raw = path.read_text(encoding="utf-8")
         cleaned = self._clean_markdown(raw)
         metadata = {
@@ -421,31 +1571,127 @@ class KvasirBrain:
             "title": path.stem,
             "source_path": str(path),
             "modified": datetime.fromtimestamp(path.stat().st_mtime).isoformat(),
-            "uid": f"note-{uuid.uuid4()}",
+            "uid": _new_uid("note"),
         }
         text_for_store = f"Title: {metadata['title']}\nUpdated: {metadata['modified']}\n\n{cleaned}"
-        doc_uid = self._store_text(text_for_store, metadata)
-        triples = self._extract_triples(text_for_store)
-        if triples:
-            self.graph.update_graph(triples, source_uid=doc_uid)
-
-    def _ingest_eml(self, path: Path) -> None:
-        parser = BytesParser(policy=policy.default)
-        message = parser.parse(path.open("rb"))
-        self._process_email_message(message, path)
+        return text_for_store, metadata
 
     def _ingest_mbox(self, path: Path) -> None:
-        mbox = mailbox.mbox(path)
+        """
+        Threaded sync path (works inside a running event loop): each message's
+        extraction is submitted to the extraction pool as soon as it is parsed, so
+        parsing, extraction and the calling thread's batch writes all overlap.
+        """
+        mbox = mailbox.mbox(path, factory=_parse_email_file)
+        pending: List[Tuple[str, Dict[str, object], Future]] = []
         for idx, message in enumerate(mbox):
-            self._process_email_message(message, path, idx)
+            text, metadata = self._prepare_email_message(message, path, idx)
+            pending.append((text, metadata, self._extract_pool.submit(self._extract_triples, text)))
+            if len(pending) >= self.ingest_batch_size:
+                self._write_extracted(pending)
+                pending = []
+        if pending:
+            self._write_extracted(pending)
+
+    async def _aingest_mbox(self, path: Path) -> None:
+        """
+        Stream the mbox through a bounded queue: a producer parses batches of
+        `ingest_batch_size` messages in a worker thread while consumers store and
+        extract earlier batches, with at most `max_concurrency` LLM calls in flight
+        across all of them.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        queue: "asyncio.Queue[List[Tuple[str, Dict[str, object]]] | None]" = asyncio.Queue(
+            maxsize=MBOX_QUEUE_BATCHES
+        )
+        messages = enumerate(mailbox.mbox(path, factory=_parse_email_file))
+
+        async def produce() -> None:
+            while True:
+                docs = await asyncio.to_thread(self._prepare_mbox_batch, messages, path)
+                if not docs:
+                    break
+                await queue.put(docs)
+            for _ in range(MBOX_BATCH_WORKERS):
+                await queue.put(None)
+
+        async def consume() -> None:
+            while (docs := await queue.get()) is not None:
+                await self._aingest_prepared(docs, semaphore)
+
+        tasks = [asyncio.create_task(produce())]
+        tasks += [asyncio.create_task(consume()) for _ in range(MBOX_BATCH_WORKERS)]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _prepare_mbox_batch(
+        self, messages: Iterable[Tuple[int, Message]], path: Path
+    ) -> List[Tuple[str, Dict[str, object]]]:
+        return [
+            self._prepare_email_message(message, path, idx)
+            for idx, message in islice(messages, self.ingest_batch_size)
+        ]
 
-    def _process_email_message(
+    def _ingest_prepared(self, docs: List[Tuple[str, Dict[str, object]]]) -> List[str]:
+        """Store a batch of `(text, metadata)` pairs, then extract their triples."""
+        return self._write_extracted(
+            [
+                (text, metadata, self._extract_pool.submit(self._extract_triples, text))
+                for text, metadata in docs
+            ]
+        )
+
+    async def _aingest_prepared(
+        self,
+        docs: List[Tuple[str, Dict[str, object]]],
+        semaphore: asyncio.Semaphore | None = None,
+        flush_graph: bool = False,
+    ) -> List[str]:
+        """
+        Async counterpart of `_ingest_prepared`: the batch is embedded and stored in
+        a worker thread while its triple extractions run via `ainvoke`, then all
+        triples are merged in one graph write (committed immediately if `flush_graph`).
+        """
+        semaphore = semaphore or asyncio.Semaphore(self.max_concurrency)
+
+        async def extract(group: List[str]) -> List[List[Tuple[str, str, str, str, str]]]:
+            async with semaphore:
+                return await self._aextract_triples_group(group)
+
+        texts = [text for text, _ in docs]
+        uids, grouped = await asyncio.gather(
+            asyncio.to_thread(self._store_text_batch, texts, [metadata for _, metadata in docs]),
+            asyncio.gather(*(extract(group) for group in self._extraction_groups(texts))),
+        )
+        triples = [doc_triples for group in grouped for doc_triples in group]
+        await self.graph.aupdate_graph_many(list(zip(triples, uids)))
+        if flush_graph:
+            await self.graph.aflush()
+        return uids
+
+    def _write_extracted(self, docs: List[Tuple[str, Dict[str, object], Future]]) -> List[str]:
+        """
+        Writer side of the ingest pipeline: embeds and stores the batch while its
+        triple extraction is still in flight, then merges all triples in one call.
+        """
+        uids = self._store_text_batch(
+            [text for text, _, _ in docs], [metadata for _, metadata, _ in docs]
+        )
+        self.graph.update_graph_many(
+            (future.result(), doc_uid) for (_, _, future), doc_uid in zip(docs, uids)
+        )
+        return uids
+
+    def _prepare_email_message(
         self, message: Message, source_path: Path, mbox_index: int | None = None
-    ) -> None:
-        subject = self._clean_subject(message.get("Subject", "") or "")
-        sender = (message.get("From") or "").strip()
-        recipients = ", ".join(message.get_all("To", []) or [])
-        date_header = message.get("Date")
+    ) -> Tuple[str, Dict[str, object]]:
+        subject = self._clean_subject(_header_text(message.get("Subject")))
+        sender = _header_text(message.get("From")).strip()
+        recipients = ", ".join(_header_text(value) for value in message.get_all("To", []))
+        date_header = _header_text(message.get("Date"))
         date_iso = ""
         if date_header:
             try:
@@ -463,7 +1709,7 @@ class KvasirBrain:
             "to": recipients,
             "date": date_header or "",
             "source_path": str(source_path),
-            "uid": f"email-{uuid.uuid4()}",
+            "uid": _new_uid("email"),
         }
         if mbox_index is not None:
             metadata["mbox_index"] = mbox_index
@@ -471,24 +1717,33 @@ class KvasirBrain:
         text_for_store = (
             f"Subject: {subject}\nFrom: {sender}\nTo: {recipients}\nDate: {date_iso or date_header or 'unknown'}\n\n{body}"
         )
-        doc_uid = self._store_text(text_for_store, metadata)
-        triples = self._extract_triples(text_for_store)
-        if triples:
-            self.graph.update_graph(triples, source_uid=doc_uid)
-
-    def _store_text(self, text: str, metadata: Dict[str, object]) -> str:
-        uid = str(metadata.get("uid") or metadata.get("id") or f"doc-{uuid.uuid4()}")
-        metadata["uid"] = uid
-        self.vector_store.add_texts(texts=[text], metadatas=[metadata], ids=[uid])
-        self.vector_store.persist()
-        return uid
-
-    def _extract_triples(self, text: str) -> List[Tuple[str, str, str]]:
+        return text_for_store, metadata
+
+    def _store_text_batch(
+        self, texts: List[str], metadatas: List[Dict[str, object]]
+    ) -> List[str]:
+        """Assign uids and add all texts with a single `add_texts` call."""
+        uids: List[str] = []
+        for metadata in metadatas:
+            uid = str(metadata.get("uid") or metadata.get("id") or _new_uid("doc"))
+            metadata["uid"] = uid
+            uids.append(uid)
+        if texts:
+            self.vector_store.add_texts(texts=texts, metadatas=metadatas, ids=uids)
+            self._pending_persist = self._needs_persist
+            if self.keyword_index is not None:
+                self.keyword_index.add(uids, texts, metadatas)
+        return uids
+
+    def _extract_triples(self, text: str) -> List[Tuple[str, str, str, str, str]]:
+        """
+        One LLM call per document that both extracts triples and links their
+        subjects/objects to existing graph entities mentioned in the text.
+        """
         try:
-            response = self.triple_chain.invoke(
-                {"text": text, "max_triples": self.max_triples}
-            )
-            return self._parse_triples(response)
+            candidates = self.graph.candidate_entities(text)
+            response = self.triple_chain.invoke(self._triple_inputs(text, candidates))
+            return self._parse_triples(response, candidates)
         except Exception as exc:  # pragma: no cover - defensive against missing model/server
             if self.verbose:
                 print(
@@ -496,124 +1751,205 @@ class KvasirBrain:
                 )
             return []
 
-    def _parse_triples(self, response: str) -> List[Tuple[str, str, str]]:
-        triples: List[Tuple[str, str, str]] = []
-        if not response or response.strip().upper() == "NONE":
-            return triples
+    async def _aextract_triples(self, text: str) -> List[Tuple[str, str, str, str, str]]:
+        try:
+            candidates = await asyncio.to_thread(self.graph.candidate_entities, text)
+            response = await self.triple_chain.ainvoke(self._triple_inputs(text, candidates))
+            return self._parse_triples(response, candidates)
+        except Exception as exc:  # pragma: no cover - defensive against missing model/server
+            if self.verbose:
+                print(
+                    f"[warn] Triple extraction skipped (LLM unavailable?): {exc}"
+                )
+            return []
+
+    async def _aextract_triples_group(
+        self, texts: List[str]
+    ) -> List[List[Tuple[str, str, str, str, str]]]:
+        """
+        Extract triples for several short documents with one LLM call. Documents
+        whose section is missing from the response are retried on their own.
+        """
+        if len(texts) == 1:
+            return [await self._aextract_triples(texts[0])]
+        try:
+            candidates = await asyncio.to_thread(self.graph.candidate_entities, "\n".join(texts))
+            documents = "\n\n".join(
+                f"### DOC {n} ###\n{text}" for n, text in enumerate(texts, start=1)
+            )
+            response = await self._batch_triple_chain.ainvoke(
+                {
+                    "documents": documents,
+                    "max_triples": self.max_triples,
+                    "existing_entities": self._entity_list(candidates),
+                }
+            )
+        except Exception as exc:  # pragma: no cover - defensive against missing model/server
+            if self.verbose:
+                print(
+                    f"[warn] Triple extraction skipped (LLM unavailable?): {exc}"
+                )
+            return [[] for _ in texts]
 
-        raw_lines = []
-        for line in response.splitlines():
-            if " AND " in line:
-                raw_lines.extend(part.strip() for part in line.split(" AND ") if part.strip())
+        results: List[List[Tuple[str, str, str, str, str]]] = []
+        for text, section in zip(texts, self._split_doc_sections(response, len(texts))):
+            if section is None:
+                results.append(await self._aextract_triples(text))
             else:
-                raw_lines.append(line.strip())
+                results.append(self._parse_triples(section, candidates))
+        return results
+
+    @staticmethod
+    def _extraction_groups(texts: List[str]) -> List[List[str]]:
+        """Split texts, in order, into groups bounded by EXTRACT_GROUP_SIZE/EXTRACT_GROUP_CHARS."""
+        groups: List[List[str]] = []
+        current: List[str] = []
+        chars = 0
+        for text in texts:
+            if current and (
+                len(current) >= EXTRACT_GROUP_SIZE or chars + len(text) > EXTRACT_GROUP_CHARS
+            ):
+                groups.append(current)
+                current, chars = [], 0
+            current.append(text)
+            chars += len(text)
+        if current:
+            groups.append(current)
+        return groups
+
+    @staticmethod
+    def _split_doc_sections(response: str, count: int) -> List[str | None]:
+        """Per-document sections of a batched response, None where a header is missing."""
+        sections: List[str | None] = [None] * count
+        parts = _RE_DOC_HEADER.split(response or "")
+        for number, body in zip(parts[1::2], parts[2::2]):
+            index = int(number) - 1
+            if 0 <= index < count and sections[index] is None:
+                sections[index] = body
+        return sections
+
+    def _triple_inputs(self, text: str, candidates: List[str]) -> Dict[str, object]:
+        return {
+            "text": text,
+            "max_triples": self.max_triples,
+            "existing_entities": self._entity_list(candidates),
+        }
 
-        for line in raw_lines:
+    @staticmethod
+    def _entity_list(candidates: List[str]) -> str:
+        return "\n".join(f"- {c}" for c in candidates) or "NONE"
+
+    def _parse_triples(
+        self, response: str, candidates: Iterable[str] = ()
+    ) -> List[Tuple[str, str, str, str, str]]:
+        """
+        Parse `Subject|Subject_canonical|Predicate|Object|Object_canonical` lines.
+        Canonicals not in `candidates` (including NONE) are dropped; plain
+        `Subject|Predicate|Object` lines are accepted as unlinked triples.
+        """
+        triples: List[Tuple[str, str, str, str, str]] = []
+        if not response or response.strip().upper() == "NONE":
+            return triples
+
+        known = set(candidates)
+        # Plain split/strip per line: linear in the response, whatever the model emits.
+        for line in response.replace(" AND ", "\n").splitlines():
             if "|" not in line:
                 continue
             parts = [part.strip() for part in line.split("|")]
-            if len(parts) != 3:
+            if len(parts) == 5:
+                subj, subj_linked, pred, obj, obj_linked = parts
+            elif len(parts) == 3:
+                (subj, pred, obj), subj_linked, obj_linked = parts, "", ""
+            else:
                 continue
-            subj, pred, obj = parts
             if subj and pred and obj:
-                triples.append((subj, pred, obj))
+                triples.append(
+                    (
+                        subj,
+                        subj_linked if subj_linked in known else "",
+                        pred,
+                        obj,
+                        obj_linked if obj_linked in known else "",
+                    )
+                )
         return triples
 
-    def _analyze_profile(self, name: str, context_texts: List[str]) -> str:
-        joined = "\n---\n".join(context_texts) if context_texts else "No specific history found."
-        prompt = ChatPromptTemplate.from_template(
-            """
-You are an expert Behavioral Psychologist.
-Analyze the following text snippets associated with {name}.
-
-Determine:
-1. Communication style (direct, passive, verbose, etc.)
-2. Emotional state or sentiments in past interactions.
-3. Potential triggers or concerns.
-
-Text History:
-{context}
-
-Profile Summary:
-"""
+    async def _aanalyze_profile(self, name: str, context_texts: List[str]) -> str:
+        return await self._profile_chain.ainvoke(
+            {"name": name, "context": self._profile_context(context_texts)}
         )
-        chain = prompt | self.llm | StrOutputParser()
-        return chain.invoke({"name": name, "context": joined})
 
-    def _draft_script(
+    @staticmethod
+    def _profile_context(context_texts: List[str]) -> str:
+        if not context_texts:
+            return "No specific history found."
+        joined = "\n---\n".join(text[:PROFILE_CHUNK_CHARS] for text in context_texts)
+        return joined[:PROFILE_TOTAL_CHARS]
+
+    async def _adraft_script(
         self, target: str, profile: str, facts: str, goal: str
     ) -> str:
-        prompt = ChatPromptTemplate.from_template(
-            """
-You are Kvasir, a concise and strategic communicator.
-
-Target: {target}
-Target Profile: {profile}
-
-Relevant Facts/Context:
-{facts}
-
-User Goal: {goal}
-
-Task:
-Write a short script for the user to say or email to the target.
-Align tone to the target's profile (if they are direct, be concise; if stressed, be empathetic).
-Use the facts to support the argument.
-
-Script:
-"""
-        )
-        chain = prompt | self.llm | StrOutputParser()
-        return chain.invoke(
-            {"target": target, "profile": profile, "facts": facts, "goal": goal}
+        return await self._script_chain.ainvoke(
+            {"target": target, "profile": profile, "facts": facts[:SCRIPT_FACTS_CHARS], "goal": goal}
         )
 
-    def _normalize_label(self, text: str) -> str:
-        text = re.sub(r"\s+", " ", text).strip()
-        return text.lower()
+    _normalize_label = staticmethod(_normalize_label)
 
     def _extract_email_body(self, message: Message) -> str:
-        if message.is_multipart():
-            for part in message.walk():
-                content_type = part.get_content_type()
-                if content_type == "text/plain":
-                    try:
-                        return part.get_content().strip()
-                    except Exception:
-                        continue
-        try:
-            return (message.get_content() or "").strip()
-        except Exception:
+        # Stop at the first inline text/plain part instead of decoding every
+        # attachment on the way, and fall back to HTML-only messages.
+        html_part = None
+        part = None
+        for candidate in message.walk():
+            if candidate.is_multipart() or candidate.get_content_disposition() == "attachment":
+                continue
+            content_type = candidate.get_content_type()
+            if content_type == "text/plain":
+                part = candidate
+                break
+            if content_type == "text/html" and html_part is None:
+                html_part = candidate
+        part = part or html_part
+        if part is None:
             return ""
+        try:
+            payload = part.get_payload(decode=True) or b""
+            content = payload.decode(part.get_content_charset() or "utf-8", errors="replace")
+        except LookupError:
+            content = payload.decode("utf-8", errors="replace")
+        if part.get_content_type() == "text/html":
+            content = _html_to_text(content)
+        return content.strip()
 
     def _clean_subject(self, subject: str) -> str:
         subject = subject.strip()
-        subject = re.sub(r"^(re:|fwd:)\s*", "", subject, flags=re.IGNORECASE)
+        subject = _RE_SUBJ_PREFIX.sub("", subject)
         return subject
 
     def _clean_email_body(self, body: str) -> str:
-        lines = body.splitlines()
         cleaned_lines: List[str] = []
-        signature_triggers = {"--", "__", "thanks,", "regards,", "cheers,", "best,", "sincerely,"}
-        for line in lines:
+        append = cleaned_lines.append
+        for line in body.splitlines():
             stripped = line.strip()
-            if stripped.startswith(">"):
-                continue
-            if re.match(r"^on .+ wrote:$", stripped, flags=re.IGNORECASE):
+            if not stripped:
+                append(line)
                 continue
-            if stripped.lower().startswith("forwarded message"):
+            if stripped[0] == ">":
                 continue
-            if stripped.lower() in signature_triggers:
+            if _RE_SIGNATURE.match(stripped):
                 break
-            cleaned_lines.append(line)
+            if _RE_EMAIL_CRUFT.match(stripped):
+                continue
+            append(line)
         cleaned = "\n".join(cleaned_lines)
-        cleaned = re.sub(r"\n{3,}", "\n\n", cleaned).strip()
+        cleaned = _RE_BLANK_RUN.sub("\n\n", cleaned).strip()
         return cleaned
 
     def _clean_markdown(self, text: str) -> str:
-        text = re.sub(r"`{1,3}.*?`{1,3}", "", text, flags=re.DOTALL)
-        text = re.sub(r"[_*#>-]{1,3}", "", text)
-        text = re.sub(r"\n{3,}", "\n\n", text)
+        text = _RE_MD_CODE.sub("", text)
+        text = _RE_MD_MARKS.sub("", text)
+        text = _RE_BLANK_RUN.sub("\n\n", text)
         return text.strip()
 
 
@@ -1,9 +1,18 @@
+import asyncio
+import hashlib
 import os
-from typing import Any, Dict, List, Optional
-
-from fastapi import FastAPI, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Annotated, Any, AsyncIterator, Awaitable, Callable, Dict, List, Literal
+
+import anyio.to_thread
+import orjson
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
 
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_community.chat_models import ChatOllama
@@ -41,31 +50,173 @@ class EmailIngestRequest(BaseModel):
 
 
 class ChatMessage(BaseModel):
-    role: str
+    role: Literal["user", "assistant", "system"]
     content: str
 
 
 class ChatRequest(BaseModel):
-    messages: List[ChatMessage]
-    query: Optional[str] = None
-    persona: Optional[str] = None
-    goal: Optional[str] = None
+    # Capped so oversized conversations are rejected before any per-message validation.
+    messages: Annotated[List[ChatMessage], Field(max_length=256)]
+    query: str | None = None
+    persona: str | None = None
+    goal: str | None = None
     k: int = 4
-    model: Optional[str] = None
+    model: str | None = None
+    # Stream the answer as Server-Sent Events instead of one JSON body.
+    stream: bool = False
+
+
+# Built once at import; /chat validates raw request bytes with it directly.
+ChatRequestAdapter = TypeAdapter(ChatRequest)
+
+
+def _inline_schema(schema: Any, defs: Dict[str, Any] | None = None) -> Any:
+    """JSON schema with local `$defs` references inlined, for use outside the model's own document."""
+    if defs is None:
+        defs = schema.get("$defs", {})
+    if isinstance(schema, dict):
+        ref = schema.get("$ref", "")
+        if ref.startswith("#/$defs/"):
+            return _inline_schema(defs[ref.rsplit("/", 1)[1]], defs)
+        return {key: _inline_schema(value, defs) for key, value in schema.items() if key != "$defs"}
+    if isinstance(schema, list):
+        return [_inline_schema(item, defs) for item in schema]
+    return schema
+
+
+class _EventStreamAwareGZip:
+    """GZip responses, except Server-Sent Event streams: gzip would buffer the deltas."""
+
+    def __init__(self, app, **gzip_options: Any) -> None:
+        self.app = app
+        self.gzip_options = gzip_options
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def app(scope, receive, gzip_send) -> None:
+            # Decided per response: event streams go straight to the client, the rest through gzip.
+            target = gzip_send
+
+            async def route(message) -> None:
+                nonlocal target
+                if message["type"] == "http.response.start":
+                    content_type = dict(message.get("headers", [])).get(b"content-type", b"")
+                    if content_type.startswith(b"text/event-stream"):
+                        target = send
+                await target(message)
+
+            await self.app(scope, receive, route)
+
+        await GZipMiddleware(app, **self.gzip_options)(scope, receive, send)
+
+
+class _PureCORS:
+    """Minimal ASGI CORS: answers preflights directly and stamps allowed origins onto responses."""
+
+    _PREFLIGHT_HEADERS = [
+        (b"access-control-allow-methods", b"GET, POST, OPTIONS"),
+        (b"access-control-max-age", b"600"),
+        (b"vary", b"Origin"),
+        (b"content-length", b"0"),
+    ]
+
+    def __init__(self, app, allow_origins: frozenset[str]) -> None:
+        self.app = app
+        self.allow_origins = frozenset(origin.encode() for origin in allow_origins)
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["path"] == "/health":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        origin = headers.get(b"origin")
+        if origin is None or origin not in self.allow_origins:
+            await self.app(scope, receive, send)
+            return
+        if scope["method"] == "OPTIONS" and b"access-control-request-method" in headers:
+            response_headers = [(b"access-control-allow-origin", origin), *self._PREFLIGHT_HEADERS]
+            requested = headers.get(b"access-control-request-headers")
+            if requested:
+                response_headers.append((b"access-control-allow-headers", requested))
+            await send({"type": "http.response.start", "status": 204, "headers": response_headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def send_with_cors(message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"access-control-allow-origin", origin),
+                    (b"vary", b"Origin"),
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
 
 
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "phi3")
 OLLAMA_NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", "4096"))
 EMBED_MODEL = os.getenv("OLLAMA_EMBED_MODEL", "nomic-embed-text")
 MEMORY_DIR = os.getenv("KVASIR_MEMORY", "kvasir_memory")
+# Optional shared cache for recall results (`pip install redis`); unset disables it.
+REDIS_URL = os.getenv("REDIS_URL")
+# Writes from outside this API (ingest_file, run_demo.py, other processes) are only
+# picked up when cached entries expire, so keep this as short as the graph's own cache.
+RECALL_CACHE_TTL = int(os.getenv("KVASIR_RECALL_CACHE_TTL", "30"))
+CORPUS_VERSION_KEY = "kvasir:corpus_version"
+# Worker threads for blocking brain calls (Neo4j, vector store, embedding cache) made from async endpoints.
+API_THREAD_WORKERS = int(os.getenv("KVASIR_API_THREADS", "128"))
+# Comma-separated browser origins allowed to call the API directly (the Vite dev server and Node proxy by default).
+CORS_ORIGINS = frozenset(
+    origin.strip()
+    for origin in os.getenv(
+        "KVASIR_CORS_ORIGINS", "http://localhost:5173,http://127.0.0.1:5173,http://localhost:3030"
+    ).split(",")
+    if origin.strip()
+)
 
-app = FastAPI(title="Kvasir Brain API", version="0.1.0")
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
+_SYS_BASE = (
+    "You are Kvasir, a knowledge-grounded assistant.\n"
+    "Use the provided context to answer. If context is missing, say so briefly."
 )
+# Shared by every /chat call without persona or goal; messages are never mutated.
+_SYS_MESSAGE = SystemMessage(content=_SYS_BASE)
+
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # Endpoints offload blocking work with asyncio.to_thread (the loop's default executor);
+    # anyio's limiter covers Starlette's own threadpool. Both default to far fewer threads.
+    executor = ThreadPoolExecutor(max_workers=API_THREAD_WORKERS, thread_name_prefix="kvasir-api")
+    asyncio.get_running_loop().set_default_executor(executor)
+    anyio.to_thread.current_default_thread_limiter().total_tokens = API_THREAD_WORKERS
+    try:
+        yield
+    finally:
+        await asyncio.to_thread(brain.close)
+        if redis_client is not None:
+            await redis_client.aclose()
+        executor.shutdown(wait=False)
+
+
+# Responses carry document text and metadata; orjson serializes them several times faster.
+app = FastAPI(
+    title="Kvasir Brain API",
+    version="0.1.0",
+    default_response_class=ORJSONResponse,
+    lifespan=_lifespan,
+)
+app.add_middleware(_PureCORS, allow_origins=CORS_ORIGINS)
+app.add_middleware(_EventStreamAwareGZip, minimum_size=1024, compresslevel=4)
+
+redis_client = None
+if REDIS_URL:
+    import redis.asyncio as redis_asyncio
+
+    redis_client = redis_asyncio.from_url(REDIS_URL)
 
 # Single brain instance reused across requests.
 brain = KvasirBrain(
@@ -76,8 +227,60 @@ brain = KvasirBrain(
 )
 
 
-@app.get("/health")
-def health() -> Dict[str, Any]:
+async def _cached_recall(kind: str, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Serve a recall result from Redis when configured. Keys include the corpus
+    version, which this API's ingest endpoints bump; writes made elsewhere show
+    up once entries expire after RECALL_CACHE_TTL seconds. Redis errors fall
+    back to computing the result.
+    """
+    if redis_client is None:
+        return await compute()
+    try:
+        version = (await redis_client.get(CORPUS_VERSION_KEY) or b"0").decode()
+        cache_key = f"kvasir:{kind}:{version}:{hashlib.sha256(key.encode()).hexdigest()}"
+        hit = await redis_client.get(cache_key)
+        if hit is not None:
+            return orjson.loads(hit)
+    except Exception:
+        return await compute()
+    result = await compute()
+    try:
+        await redis_client.setex(cache_key, RECALL_CACHE_TTL, orjson.dumps(result))
+    except Exception:
+        pass
+    return result
+
+
+async def _recall_vectors(query: str, k: int) -> List[Dict[str, Any]]:
+    return await _cached_recall(
+        "vectors", f"{k}\0{query}", lambda: asyncio.to_thread(brain.recall_vectors, query, k=k)
+    )
+
+
+async def _recall_structure(entity: str) -> List[Dict[str, str]]:
+    return await _cached_recall(
+        "graph", entity, lambda: asyncio.to_thread(brain.recall_structure, entity)
+    )
+
+
+async def _corpus_changed() -> None:
+    if redis_client is None:
+        return
+    try:
+        await redis_client.incr(CORPUS_VERSION_KEY)
+    except Exception:
+        pass
+
+
+@lru_cache(maxsize=8)
+def _get_llm(model: str) -> ChatOllama:
+    """Chat handle per non-default model, reused across requests."""
+    return ChatOllama(model=model, temperature=0.3, num_ctx=OLLAMA_NUM_CTX)
+
+
+@app.get("/health", response_model=None)
+async def health() -> Dict[str, Any]:
     return {
         "status": "ok",
         "model": OLLAMA_MODEL,
@@ -85,22 +288,22 @@ def health() -> Dict[str, Any]:
     }
 
 
-@app.post("/ingest")
-def ingest(req: IngestRequest) -> Dict[str, Any]:
+@app.post("/ingest", response_model=None)
+async def ingest(req: IngestRequest) -> Dict[str, Any]:
     try:
         metadata = dict(req.metadata or {})
         metadata.setdefault("type", req.type or "text")
-        doc_uid = brain.ingest_text(req.content, metadata=metadata)
+        doc_uid = await brain.aingest_text(req.content, metadata=metadata, flush_graph=True)
+        await _corpus_changed()
         return {"doc_uid": doc_uid, "type": metadata["type"]}
     except Exception as exc:  # pragma: no cover - surfaced to client
         raise HTTPException(status_code=500, detail=str(exc)) from exc
 
 
-@app.post("/ingest/email")
-def ingest_email(req: EmailIngestRequest) -> Dict[str, Any]:
-    ingested = []
-    for msg in req.messages:
-        content = "\n".join(
+@app.post("/ingest/email", response_model=None)
+async def ingest_email(req: EmailIngestRequest) -> Dict[str, Any]:
+    contents = [
+        "\n".join(
             [
                 f"Subject: {msg.subject or '(No subject)'}",
                 f"From: {', '.join(msg.from_)}",
@@ -111,8 +314,10 @@ def ingest_email(req: EmailIngestRequest) -> Dict[str, Any]:
                 msg.text or msg.snippet or "",
             ]
         ).strip()
-
-        metadata = {
+        for msg in req.messages
+    ]
+    metadatas = [
+        {
             "type": "email",
             "thread_id": msg.thread_id,
             "message_id": msg.message_id,
@@ -123,42 +328,85 @@ def ingest_email(req: EmailIngestRequest) -> Dict[str, Any]:
             "date": msg.date,
             **(msg.metadata or {}),
         }
-        doc_uid = brain.ingest_text(content, metadata=metadata)
-        ingested.append({"message_id": msg.message_id, "doc_uid": doc_uid})
+        for msg in req.messages
+    ]
+    # One batch: a single embedding request to Ollama and one UNWIND write to Neo4j.
+    doc_uids = (
+        await brain.aingest_texts(contents, metadatas, flush_graph=True) if contents else []
+    )
+    if doc_uids:
+        await _corpus_changed()
+    ingested = [
+        {"message_id": msg.message_id, "doc_uid": doc_uid}
+        for msg, doc_uid in zip(req.messages, doc_uids)
+    ]
 
     return {"count": len(ingested), "ingested": ingested}
 
 
-@app.get("/search")
-def search(q: str, k: int = 4) -> Dict[str, Any]:
+@app.get("/search", response_model=None)
+async def search(q: str, k: int = 4) -> Dict[str, Any]:
     try:
-        results = brain.recall_vectors(q, k=k)
+        results = await _recall_vectors(q, k)
         return {"query": q, "results": results}
     except Exception as exc:  # pragma: no cover
         raise HTTPException(status_code=500, detail=str(exc)) from exc
 
 
-@app.get("/graph")
-def graph(entity: str) -> Dict[str, Any]:
+@app.get("/graph", response_model=None)
+async def graph(entity: str) -> Dict[str, Any]:
     try:
-        relations = brain.recall_structure(entity)
+        relations = await _recall_structure(entity)
         return {"entity": entity, "relations": relations}
     except Exception as exc:  # pragma: no cover
         raise HTTPException(status_code=500, detail=str(exc)) from exc
 
 
-@app.post("/chat")
-def chat(req: ChatRequest) -> Dict[str, Any]:
+# The body is validated by hand below, so describe it for the OpenAPI schema explicitly.
+@app.post(
+    "/chat",
+    response_model=None,
+    openapi_extra={
+        "requestBody": {
+            "content": {
+                "application/json": {"schema": _inline_schema(ChatRequest.model_json_schema())}
+            },
+            "required": True,
+        }
+    },
+)
+async def chat(request: Request) -> Dict[str, Any] | StreamingResponse:
+    try:
+        req = ChatRequestAdapter.validate_json(await request.body())
+    except ValidationError as exc:
+        # Same 422 shape as FastAPI's own body validation: locations start with "body".
+        raise RequestValidationError(
+            [
+                {**error, "loc": ("body", *error["loc"])}
+                for error in exc.errors(include_url=False)
+            ]
+        ) from exc
     if not req.messages:
         raise HTTPException(status_code=400, detail="messages are required")
 
-    query = req.query or next(
-        (m.content for m in reversed(req.messages) if m.role == "user"), ""
+    query = req.query
+    if not query:
+        # The latest user turn; almost always the last message, so check it first.
+        messages = req.messages
+        query = ""
+        if messages[-1].role == "user":
+            query = messages[-1].content
+        else:
+            for i in range(len(messages) - 2, -1, -1):
+                if messages[i].role == "user":
+                    query = messages[i].content
+                    break
+
+    vector_hits, graph_hits = await asyncio.gather(
+        _recall_vectors(query, max(2, req.k)),
+        _recall_structure(query),
     )
 
-    vector_hits = brain.recall_vectors(query, k=max(2, req.k))
-    graph_hits = brain.recall_structure(query)
-
     context_lines = []
     for idx, doc in enumerate(vector_hits, start=1):
         meta = doc.get("metadata", {}) or {}
@@ -170,40 +418,44 @@ def chat(req: ChatRequest) -> Dict[str, Any]:
         for rel in graph_hits:
             context_lines.append(f"- {rel['subject']} -[{rel['predicate']}]-> {rel['object']}")
 
-    context_blob = "\n".join(context_lines) or "No context found."
-
-    system_parts = [
-        "You are Kvasir, a knowledge-grounded assistant.",
-        "Use the provided context to answer. If context is missing, say so briefly.",
-    ]
-    if req.persona:
-        system_parts.append(f"Persona: {req.persona}")
-    if req.goal:
-        system_parts.append(f"Goal: {req.goal}")
-    system = "\n".join(system_parts)
-
-    user_prompt = "\n\n".join(
+    if req.persona or req.goal:
+        system = _SYS_BASE
+        if req.persona:
+            system += f"\nPersona: {req.persona}"
+        if req.goal:
+            system += f"\nGoal: {req.goal}"
+        system_message = SystemMessage(content=system)
+    else:
+        system_message = _SYS_MESSAGE
+
+    # One flat list and a single join; same text as joining the sections separately.
+    user_prompt = "\n".join(
         [
-          "Context:",
-          context_blob,
-          "Conversation:",
-          "\n".join(f"{m.role}: {m.content}" for m in req.messages),
+            "Context:",
+            "",
+            *(context_lines or ["No context found."]),
+            "",
+            "Conversation:",
+            "",
+            *(f"{m.role}: {m.content}" for m in req.messages),
         ]
     )
 
-    try:
-        model_name = req.model or OLLAMA_MODEL
-        llm = (
-            brain.llm
-            if model_name == OLLAMA_MODEL
-            else ChatOllama(model=model_name, temperature=0.3, num_ctx=OLLAMA_NUM_CTX)
-        )
-        completion = llm.invoke(
-            [
-                SystemMessage(content=system),
-                HumanMessage(content=user_prompt),
-            ],
+    model_name = req.model or OLLAMA_MODEL
+    llm = brain.llm if model_name == OLLAMA_MODEL else _get_llm(model_name)
+    prompt = [
+        system_message,
+        HumanMessage(content=user_prompt),
+    ]
+
+    if req.stream:
+        context = {"vectors": vector_hits, "graph": graph_hits}
+        return StreamingResponse(
+            _stream_chat(llm, prompt, context, query), media_type="text/event-stream"
         )
+
+    try:
+        completion = await llm.ainvoke(prompt)
         answer = getattr(completion, "content", str(completion))
     except Exception as exc:  # pragma: no cover
         raise HTTPException(status_code=500, detail=str(exc)) from exc
@@ -215,7 +467,29 @@ def chat(req: ChatRequest) -> Dict[str, Any]:
     }
 
 
+def _sse(data: Dict[str, Any], event: str | None = None) -> bytes:
+    prefix = f"event: {event}\n".encode() if event else b""
+    return prefix + b"data: " + orjson.dumps(data) + b"\n\n"
+
+
+async def _stream_chat(
+    llm: ChatOllama, prompt: List[Any], context: Dict[str, Any], query: str
+) -> AsyncIterator[bytes]:
+    """SSE stream: one `context` event, `data` events with answer deltas, then `done` (or `error`)."""
+    yield _sse({"context": context, "query": query}, event="context")
+    try:
+        async for chunk in llm.astream(prompt):
+            delta = getattr(chunk, "content", str(chunk))
+            if delta:
+                yield _sse({"delta": delta})
+    except Exception as exc:  # pragma: no cover - surfaced to client
+        yield _sse({"detail": str(exc)}, event="error")
+        return
+    yield _sse({}, event="done")
+
+
 if __name__ == "__main__":
     import uvicorn
 
+    # With uvicorn[standard] installed, the default "auto" loop/http settings pick uvloop and httptools.
     uvicorn.run("python_api:app", host="0.0.0.0", port=int(os.getenv("PY_API_PORT", "8000")), reload=True)
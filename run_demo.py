@@ -1,9 +1,18 @@
+import asyncio
+import sys
 from pathlib import Path
 
 from kvasir_brain import KvasirBrain
 
 
-def main() -> None:
+def _write_relations(relations) -> None:
+    """One stdout write for the whole listing instead of a print per edge."""
+    lines = [f"- {rel['subject']} -[{rel['predicate']}]-> {rel['object']}\n" for rel in relations]
+    sys.stdout.write("".join(lines))
+    sys.stdout.flush()
+
+
+async def main() -> None:
     try:
         brain = KvasirBrain(verbose=True)
     except RuntimeError as e:
@@ -18,25 +27,31 @@ def main() -> None:
         return
 
     print("--- Ingesting sample data ---")
-    for file_path in sorted(sample_dir.iterdir()):
-        if file_path.is_file():
-            print(f"Ingesting {file_path}...")
-            brain.ingest_file(file_path)
+    paths = [path for path in sorted(sample_dir.iterdir()) if path.is_file()]
+    print(f"Ingesting {len(paths)} files from {sample_dir}...")
+    # Files are parsed concurrently and embedded/extracted as one batch.
+    await brain.aingest_files(paths)
     print("--- Ingestion complete ---\n")
 
 
     print("--- Recall examples ---")
     print("\nNeighbors for 'Project Alpha':")
     try:
-        for rel in brain.recall_structure("Project Alpha"):
-            print(f"- {rel['subject']} -[{rel['predicate']}]-> {rel['object']}")
+        relations = await asyncio.to_thread(brain.recall_structure, "Project Alpha")
+        _write_relations(relations)
     except Exception as e:
         print(f"Error recalling structure: {e}")
 
+    print("\nFull graph:")
+    try:
+        _write_relations(await asyncio.to_thread(brain.dump_graph))
+    except Exception as e:
+        print(f"Error dumping graph: {e}")
+
 
     print("\nVector recall for 'deadline next friday':")
     try:
-        for item in brain.recall_vectors("deadline next friday", k=3):
+        for item in await asyncio.to_thread(brain.recall_vectors, "deadline next friday", k=3):
             metadata = item.get("metadata", {})
             title = metadata.get("subject") or metadata.get("title") or "untitled"
             first_line = item["content"].splitlines()[0] if item["content"] else ""
@@ -51,4 +66,4 @@ def main() -> None:
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
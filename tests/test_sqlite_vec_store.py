@@ -0,0 +1,48 @@
+import sqlite3
+
+import pytest
+
+if not hasattr(sqlite3.Connection, "enable_load_extension"):
+    pytest.skip("Python built without SQLite extension loading", allow_module_level=True)
+pytest.importorskip("neo4j")
+pytest.importorskip("langchain_core")
+pytest.importorskip("sqlite_vec")
+
+from kvasir_brain import SqliteVecStore
+
+
+class KeywordEmbeddings:
+    """Deterministic 3-d vectors, one axis per keyword, so nearest neighbours are known."""
+
+    AXES = ("alpha", "beta", "gamma")
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        return [1.0 if axis in text else 0.0 for axis in self.AXES]
+
+
+@pytest.mark.parametrize("quantize_int8", [False, True])
+def test_knn_query_returns_nearest_documents(tmp_path, quantize_int8):
+    store = SqliteVecStore(
+        tmp_path / "vectors.sqlite", KeywordEmbeddings(), quantize_int8=quantize_int8
+    )
+    store.add_texts(
+        ["alpha note", "beta note", "gamma note", "alpha beta note"],
+        metadatas=[{"n": 0}, {"n": 1}, {"n": 2}, {"n": 3}],
+        ids=["a", "b", "c", "ab"],
+    )
+
+    hits = store.similarity_search("alpha", k=2)
+
+    assert [doc.page_content for doc in hits] == ["alpha note", "alpha beta note"]
+    assert hits[0].metadata == {"n": 0}
+    store.close()
+
+
+def test_knn_query_on_empty_store(tmp_path):
+    store = SqliteVecStore(tmp_path / "vectors.sqlite", KeywordEmbeddings())
+
+    assert store.similarity_search("alpha", k=4) == []
+    store.close()